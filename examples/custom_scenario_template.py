@@ -13,6 +13,7 @@ from typing import List, Dict
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from sja1110_dual_firmware import SJA1110FirmwareBuilder
+from sja1110_rj45_scenarios import PORT_NAMES
 
 class CustomFRERScenario:
     """Template class for creating custom FRER scenarios"""
@@ -25,7 +26,7 @@ class CustomFRERScenario:
                            dst_ports: List[int], vlan_id: int = 100, 
                            priority: int = 6):
         """Add a replication rule to the scenario"""
-        stream_id = len(self.builder.frer_streams) + 1
+        stream_id = len(self.builder.streams) + 1
         
         self.builder.add_frer_replication_stream(
             stream_id=stream_id,
@@ -37,9 +38,8 @@ class CustomFRERScenario:
         )
         
         print(f"Added rule: {description}")
-        src_name = self.builder.port_config[src_port]['name']
-        dst_names = [self.builder.port_config[p]['name'] for p in dst_ports]
-        print(f"  {src_name} → {dst_names}")
+        dst_names = [PORT_NAMES[p] for p in dst_ports]
+        print(f"  {PORT_NAMES[src_port]} → {dst_names}")
         
     def build_and_save(self):
         """Build firmware and save files"""
@@ -146,16 +146,16 @@ def interactive_scenario_builder():
     scenario = CustomFRERScenario(scenario_name)
     
     print("\nAvailable ports:")
-    for port_id, info in scenario.builder.port_config.items():
-        print(f"  {port_id}: {info['name']} ({info['type']})")
+    for port_id, name in sorted(PORT_NAMES.items()):
+        print(f"  {port_id}: {name}")
     
     while True:
-        print(f"\nAdding replication rule #{len(scenario.builder.frer_streams) + 1}")
+        print(f"\nAdding replication rule #{len(scenario.builder.streams) + 1}")
         
         # Get source port
         try:
-            src_port = int(input("Source port (0-10): "))
-            if src_port not in scenario.builder.port_config:
+            src_port = int(input(f"Source port ({min(PORT_NAMES)}-{max(PORT_NAMES)}): "))
+            if src_port not in PORT_NAMES:
                 print("Invalid source port!")
                 continue
         except ValueError:
@@ -166,7 +166,7 @@ def interactive_scenario_builder():
         try:
             dst_input = input("Destination ports (comma-separated, e.g., 2,3,5): ")
             dst_ports = [int(p.strip()) for p in dst_input.split(',')]
-            if not all(p in scenario.builder.port_config for p in dst_ports):
+            if not all(p in PORT_NAMES for p in dst_ports):
                 print("One or more destination ports are invalid!")
                 continue
         except ValueError:
@@ -176,10 +176,10 @@ def interactive_scenario_builder():
         # Get description
         description = input("Rule description: ").strip()
         if not description:
-            description = f"Rule_{len(scenario.builder.frer_streams) + 1}"
+            description = f"Rule_{len(scenario.builder.streams) + 1}"
         
         # Get VLAN and priority (optional)
-        vlan_id = 100 + len(scenario.builder.frer_streams)
+        vlan_id = 100 + len(scenario.builder.streams)
         priority = 6
         
         try:
@@ -13,6 +13,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from sja1110_dual_firmware import SJA1110FirmwareBuilder
+from sja1110_rj45_scenarios import PORT_NAMES
 
 def create_basic_rj45_frer():
     """Create a basic RJ45 replication scenario"""
@@ -63,12 +64,11 @@ def create_basic_rj45_frer():
     print("✓ Configuration details saved to sja1110_firmware_config.json")
     
     print("\nFRER Configuration Summary:")
-    for stream in builder.frer_streams:
-        src_name = builder.port_config[stream['src_port']]['name']
-        dst_names = [builder.port_config[p]['name'] for p in stream['dst_ports']]
-        print(f"  • {stream['name']}")
-        print(f"    {src_name} → {dst_names}")
-        print(f"    VLAN: {stream['vlan_id']}, Priority: {stream['priority']}")
+    for stream in builder.streams:
+        dst_names = [PORT_NAMES[p] for p in stream.dst_ports]
+        print(f"  • {stream.name}")
+        print(f"    {PORT_NAMES[stream.src_port]} → {dst_names}")
+        print(f"    VLAN: {stream.vlan_id}, Priority: {stream.priority}")
     
     return uc_file, switch_file
 
@@ -4,18 +4,24 @@ FRER 사용 예제
 Gold Box에서 프레임 복제 구성하는 방법
 """
 
+import json
+import shlex
 import subprocess
 import sys
 
-def run_command(cmd):
+def run_command(cmd, stdin=None):
     """명령 실행 및 출력"""
     print(f"\n실행: {cmd}")
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    result = subprocess.run(shlex.split(cmd), input=stdin, capture_output=True, text=True)
     print(result.stdout)
     if result.stderr:
         print(f"에러: {result.stderr}")
     return result.returncode == 0
 
+def run_batch(commands):
+    """여러 frer 명령을 하나의 프로세스에서 실행 (스트림 구성이 유지됨)"""
+    return run_command("./frer batch --file -", stdin=json.dumps(commands))
+
 def main():
     print("=" * 60)
     print("Gold Box FRER 구성 예제")
@@ -26,28 +32,27 @@ def main():
 
     commands = [
         # FRER 활성화
-        "./frer enable",
+        "enable",
 
         # 스트림 추가: P1 → P2A, P2B
-        "./frer add-stream --stream-id 1 --src-port P1 --dst-ports P2A P2B --vlan-id 100",
+        "add-stream --stream-id 1 --src-port P1 --dst-ports P2A P2B --vlan-id 100",
 
         # 상태 확인
-        "./frer status",
+        "status",
 
         # 바이너리 생성
-        "./frer generate-binary --output simple_frer.bin"
+        "generate-binary --output simple_frer.bin"
     ]
 
-    for cmd in commands:
-        if not run_command(cmd):
-            print(f"명령 실패: {cmd}")
-            sys.exit(1)
+    if not run_batch(commands):
+        print("명령 실패: 간단한 복제 설정")
+        sys.exit(1)
 
     print("\n### 2. 복잡한 시나리오 ###")
     print("여러 스트림 동시 구성")
 
     # 새로운 인스턴스로 시작
-    run_command("./frer enable")
+    commands = ["enable"]
 
     # 여러 스트림 추가
     streams = [
@@ -78,19 +83,20 @@ def main():
     ]
 
     for stream in streams:
-        cmd = (f"./frer add-stream --stream-id {stream['id']} "
-               f"--src-port {stream['src']} "
-               f"--dst-ports {' '.join(stream['dst'])} "
-               f"--vlan-id {stream['vlan']} "
-               f"--name '{stream['desc']}'")
-        run_command(cmd)
+        commands.append(f"add-stream --stream-id {stream['id']} "
+                        f"--src-port {stream['src']} "
+                        f"--dst-ports {' '.join(stream['dst'])} "
+                        f"--vlan-id {stream['vlan']} "
+                        f"--name '{stream['desc']}'")
 
     # 최종 상태 확인
-    run_command("./frer status")
+    commands.append("status")
 
     # 구성 저장
-    run_command("./frer save --file complex_config.json")
-    run_command("./frer generate-binary --output complex_frer.bin")
+    commands.append("save --file complex_config.json")
+    commands.append("generate-binary --output complex_frer.bin")
+
+    run_batch(commands)
 
     print("\n### 3. 사전 정의된 시나리오 사용 ###")
 
@@ -103,8 +109,8 @@ def main():
 
     for scenario in scenarios:
         print(f"\n시나리오: {scenario}")
-        run_command(f"./frer scenario --scenario {scenario}")
-        run_command(f"./frer generate-binary --output {scenario}.bin")
+        run_batch([f"scenario --scenario {scenario}",
+                   f"generate-binary --output {scenario}.bin"])
 
     print("\n" + "=" * 60)
     print("완료! 생성된 파일:")
@@ -9,6 +9,10 @@ import sys
 import struct
 import zlib
 import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, repeat
+from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -22,99 +26,172 @@ RTAG_ETHERTYPE = 0xF1C1
 UC_BINARY_SIZE = 320280
 SWITCH_BINARY_SIZE = 655360
 
-def generate_uc_binary(scenario_name):
-    """Generate UC binary for a scenario"""
-    uc_data = bytearray()
-    uc_data.extend(IMAGE_VALID_MARKER)
-    uc_data.extend(struct.pack('<I', DEVICE_ID_SJA1110))
+# Configuration table offsets (from UM11107)
+GENERAL_PARAMS_OFFSET = 0x034000
+CB_SEQ_GEN_TABLE_OFFSET = 0x080000
+CB_IND_REC_TABLE_OFFSET = 0x090000
+DPI_TABLE_OFFSET = 0x0A0000
 
-    # Add scenario identifier
-    scenario_id = scenario_name.encode('utf-8')[:32]
-    uc_data.extend(scenario_id)
-    uc_data.extend(b'\x00' * (32 - len(scenario_id)))
+# Table entry layouts
+CB_SEQ_GEN_ENTRY = struct.Struct('<HHBH')
+CB_IND_REC_ENTRY = struct.Struct('<HBBHHH')
+DPI_ENTRY = struct.Struct('<HHHBBBB')
 
-    # Pad to expected size
-    while len(uc_data) < UC_BINARY_SIZE:
-        uc_data.extend(b'\x00')
+# Bit for each switch port in the 16-bit CB port mask
+PORT_BIT = tuple(1 << p for p in range(16))
 
-    return bytes(uc_data)
+# Helper script written next to the binaries
+UPLOAD_SCRIPT = """#!/bin/bash
+# Upload script for FRER binaries
+SCENARIO="${1:-test_scenario}"
+echo "Uploading scenario: $SCENARIO"
+sudo ../goldbox_dual_upload.sh sja1110_uc_${SCENARIO}.bin sja1110_switch_${SCENARIO}.bin
+"""
 
-def generate_switch_binary(streams):
-    """Generate switch binary with FRER configuration"""
-    config = bytearray()
+# Configuration flags
+CONFIG_FLAGS = (1 << 31) | (1 << 30) | (1 << 29) | (1 << 28)
 
-    # Header
-    config.extend(IMAGE_VALID_MARKER)
-    config.extend(struct.pack('<I', DEVICE_ID_SJA1110))
+def _build_uc_template():
+    """Zero-filled UC image carrying the marker and device ID"""
+    template = bytearray(UC_BINARY_SIZE)
+    struct.pack_into('<8sI', template, 0, IMAGE_VALID_MARKER, DEVICE_ID_SJA1110)
+    return bytes(template)
 
-    # Configuration flags
-    config_flags = (1 << 31) | (1 << 30) | (1 << 29) | (1 << 28)
-    config.extend(struct.pack('<I', config_flags))
+def _build_switch_template():
+    """Zero-filled switch image carrying everything that is not per-stream"""
+    template = bytearray(SWITCH_BINARY_SIZE)
 
-    # Pad to General Parameters offset (0x034000)
-    while len(config) < 0x034000:
-        config.extend(b'\x00')
+    # Header
+    struct.pack_into('<8sII', template, 0, IMAGE_VALID_MARKER, DEVICE_ID_SJA1110, CONFIG_FLAGS)
 
     # General Parameters - FRMREPEN (Frame Replication Enable)
-    config.extend(struct.pack('<I', 1))  # Enable FRER
-    config.extend(struct.pack('<BB', 4, 10))  # Host port 4 (PFE_MAC0), Cascade port 10
-
-    # Pad to CB Sequence Generation Table (0x080000)
-    while len(config) < 0x080000:
-        config.extend(b'\x00')
+    # Host port 4 (PFE_MAC0), Cascade port 10
+    struct.pack_into('<IBB', template, GENERAL_PARAMS_OFFSET, 1, 4, 10)
+
+    return bytes(template)
+
+# Built once; every scenario starts from a copy and only patches its tables
+_UC_TEMPLATE = _build_uc_template()
+_SWITCH_TEMPLATE = _build_switch_template()
+
+@lru_cache(maxsize=None)
+def _switch_tables_layout(n):
+    """Struct covering all three stream tables for n streams, and image size
+
+    The layout only depends on the stream count, so it is compiled once per
+    count.  A table that outgrows its slot pushes the next one back, exactly
+    as the old append-and-pad loop did; the gaps between tables are 'x' pad
+    bytes, which pack as zeros.
+    """
+    cb_end = CB_SEQ_GEN_TABLE_OFFSET + CB_SEQ_GEN_ENTRY.size * n
+    rec_offset = max(cb_end, CB_IND_REC_TABLE_OFFSET)
+    rec_end = rec_offset + CB_IND_REC_ENTRY.size * n
+    dpi_offset = max(rec_end, DPI_TABLE_OFFSET)
+    dpi_end = dpi_offset + DPI_ENTRY.size * n
+
+    # '<' disables alignment, so repeating the field codes gives exactly n
+    # consecutive entries
+    tables = struct.Struct('<'
+                           + CB_SEQ_GEN_ENTRY.format[1:] * n
+                           + f'{rec_offset - cb_end}x'
+                           + CB_IND_REC_ENTRY.format[1:] * n
+                           + f'{dpi_offset - rec_end}x'
+                           + DPI_ENTRY.format[1:] * n)
+    return tables, max(dpi_end, SWITCH_BINARY_SIZE)
 
-    # CB Sequence Generation Table (for frame replication)
-    for stream in streams:
-        # Calculate port mask
-        port_mask = sum(1 << p for p in stream['dst_ports'])
+def generate_uc_binary(scenario_name):
+    """Generate UC binary for a scenario"""
+    uc_data = bytearray(_UC_TEMPLATE)
 
-        cb_entry = struct.pack('<HHBH',
-                              stream['id'],      # stream_handle
-                              port_mask,         # port_mask
-                              0x80,             # flags (enabled)
-                              0)                # seq_num
-        config.extend(cb_entry)
+    # Add scenario identifier (zero-padded to 32 bytes by the template)
+    scenario_id = scenario_name.encode('utf-8')[:32]
+    uc_data[12:12 + len(scenario_id)] = scenario_id
 
-    # Pad to CB Individual Recovery Table (0x090000)
-    while len(config) < 0x090000:
-        config.extend(b'\x00')
+    # Returned as-is: file.write() takes the bytearray without another copy
+    return uc_data
 
-    # CB Individual Recovery Table (for duplicate elimination)
-    for stream in streams:
-        rec_entry = struct.pack('<HBBHHH',
-                               stream['id'],       # stream_handle
-                               stream['src_port'], # ingress_port
-                               0x80,              # flags (enabled)
-                               0,                 # seq_num
-                               32,                # history_len
-                               100)               # reset_timeout
-        config.extend(rec_entry)
-
-    # Pad to DPI Table (0x0A0000)
-    while len(config) < 0x0A0000:
-        config.extend(b'\x00')
-
-    # DPI Configuration
+def generate_switch_binary(streams):
+    """Generate switch binary with FRER configuration"""
+    tables, image_size = _switch_tables_layout(len(streams))
+
+    # Start from the shared template and grow it to hold the tables and CRC
+    config = bytearray(_SWITCH_TEMPLATE)
+    config.extend(bytes(image_size + 4 - len(config)))
+
+    # Pull each field out of the stream dicts once; all three tables are
+    # then emitted column-wise with a single pack_into()
+    ids = [stream['id'] for stream in streams]
+    src_ports = [stream['src_port'] for stream in streams]
+    vlans = [stream.get('vlan', 100) for stream in streams]
+    priorities = [stream.get('priority', 6) for stream in streams]
+    port_masks = []
     for stream in streams:
-        dpi_entry = struct.pack('<HHHBBBB',
-                               stream['id'],           # stream_id
-                               stream.get('vlan', 100), # vlan_id
-                               RTAG_ETHERTYPE,         # rtag_type
-                               1,                      # cb_en
-                               1,                      # sn_num_greater
-                               stream.get('priority', 6), # priority
-                               stream['src_port'])     # ingress_port
-        config.extend(dpi_entry)
-
-    # Pad to minimum size
-    while len(config) < SWITCH_BINARY_SIZE:
-        config.extend(b'\x00')
-
-    # Add CRC32
-    crc = zlib.crc32(bytes(config)) & 0xFFFFFFFF
-    config.extend(struct.pack('<I', crc))
-
-    return bytes(config)
+        port_mask = 0
+        for p in stream['dst_ports']:
+            port_mask |= PORT_BIT[p]
+        port_masks.append(port_mask)
+
+    tables.pack_into(config, CB_SEQ_GEN_TABLE_OFFSET, *chain(
+        # CB Sequence Generation Table (for frame replication):
+        # stream_handle, port_mask, flags (enabled), seq_num
+        chain.from_iterable(zip(ids, port_masks, repeat(0x80), repeat(0))),
+        # CB Individual Recovery Table (for duplicate elimination):
+        # stream_handle, ingress_port, flags (enabled), seq_num,
+        # history_len, reset_timeout
+        chain.from_iterable(zip(ids, src_ports, repeat(0x80), repeat(0),
+                                repeat(32), repeat(100))),
+        # DPI Configuration:
+        # stream_id, vlan_id, rtag_type, cb_en, sn_num_greater, priority,
+        # ingress_port
+        chain.from_iterable(zip(ids, vlans, repeat(RTAG_ETHERTYPE), repeat(1),
+                                repeat(1), priorities, src_ports))))
+
+    # Add CRC32 (hashed in place, without copying the image)
+    crc = zlib.crc32(memoryview(config)[:image_size]) & 0xFFFFFFFF
+    struct.pack_into('<I', config, image_size, crc)
+
+    # Returned as-is: file.write() takes the bytearray without another copy
+    return config
+
+def build_scenario(scenario_name, scenario_data, output_dir):
+    """Write the UC, switch and JSON files for one scenario
+
+    Returns the report lines instead of printing them, so scenarios built in
+    worker processes do not interleave their output.
+    """
+    report = [f"\nGenerating: {scenario_name}",
+              f"  Description: {scenario_data['description']}",
+              f"  Streams: {len(scenario_data['streams'])}"]
+
+    # Generate UC binary
+    uc_binary = generate_uc_binary(scenario_name)
+    uc_name = f"sja1110_uc_{scenario_name}.bin"
+    with open(f"{output_dir}/{uc_name}", 'wb') as f:
+        f.write(uc_binary)
+    report.append(f"  ✓ UC binary: {uc_name} ({len(uc_binary)} bytes)")
+
+    # Generate switch binary
+    switch_binary = generate_switch_binary(scenario_data['streams'])
+    switch_name = f"sja1110_switch_{scenario_name}.bin"
+    with open(f"{output_dir}/{switch_name}", 'wb') as f:
+        f.write(switch_binary)
+    report.append(f"  ✓ Switch binary: {switch_name} ({len(switch_binary)} bytes)")
+
+    # Generate JSON configuration
+    config = {
+        'scenario': scenario_name,
+        'description': scenario_data['description'],
+        'streams': scenario_data['streams'],
+        'uc_file': uc_name,
+        'switch_file': switch_name
+    }
+    json_name = f"config_{scenario_name}.json"
+    with open(f"{output_dir}/{json_name}", 'w') as f:
+        # Encode in one go; json.dump() issues a write() per encoder chunk
+        f.write(json.dumps(config, indent=2))
+    report.append(f"  ✓ Config JSON: {json_name}")
+
+    return report
 
 def main():
     """Generate all FRER binaries"""
@@ -214,38 +291,12 @@ def main():
     print("Generating FRER Binaries for Gold Box")
     print("=" * 60)
 
-    # Generate binaries for each scenario
-    for scenario_name, scenario_data in scenarios.items():
-        print(f"\nGenerating: {scenario_name}")
-        print(f"  Description: {scenario_data['description']}")
-        print(f"  Streams: {len(scenario_data['streams'])}")
-
-        # Generate UC binary
-        uc_binary = generate_uc_binary(scenario_name)
-        uc_filename = os.path.join(output_dir, f"sja1110_uc_{scenario_name}.bin")
-        with open(uc_filename, 'wb') as f:
-            f.write(uc_binary)
-        print(f"  ✓ UC binary: {os.path.basename(uc_filename)} ({len(uc_binary)} bytes)")
-
-        # Generate switch binary
-        switch_binary = generate_switch_binary(scenario_data['streams'])
-        switch_filename = os.path.join(output_dir, f"sja1110_switch_{scenario_name}.bin")
-        with open(switch_filename, 'wb') as f:
-            f.write(switch_binary)
-        print(f"  ✓ Switch binary: {os.path.basename(switch_filename)} ({len(switch_binary)} bytes)")
-
-        # Generate JSON configuration
-        config = {
-            'scenario': scenario_name,
-            'description': scenario_data['description'],
-            'streams': scenario_data['streams'],
-            'uc_file': os.path.basename(uc_filename),
-            'switch_file': os.path.basename(switch_filename)
-        }
-        json_filename = os.path.join(output_dir, f"config_{scenario_name}.json")
-        with open(json_filename, 'w') as f:
-            json.dump(config, f, indent=2)
-        print(f"  ✓ Config JSON: {os.path.basename(json_filename)}")
+    # Scenarios are independent, so build them in parallel and print the
+    # reports in definition order once they are done
+    with ProcessPoolExecutor() as pool:
+        for report in pool.map(build_scenario, scenarios.keys(), scenarios.values(),
+                               repeat(output_dir)):
+            print("\n".join(report))
 
     # Generate master UC binary (works with all switch configs)
     master_uc = generate_uc_binary('master')
@@ -254,16 +305,11 @@ def main():
         f.write(master_uc)
     print(f"\n✓ Master UC binary: sja1110_uc_master.bin")
 
-    # Create upload script
-    upload_script = os.path.join(output_dir, 'upload.sh')
-    with open(upload_script, 'w') as f:
-        f.write("""#!/bin/bash
-# Upload script for FRER binaries
-SCENARIO="${1:-test_scenario}"
-echo "Uploading scenario: $SCENARIO"
-sudo ../goldbox_dual_upload.sh sja1110_uc_${SCENARIO}.bin sja1110_switch_${SCENARIO}.bin
-""")
-    os.chmod(upload_script, 0o755)
+    # Create upload script (left alone when an identical one is already there)
+    upload_script = Path(output_dir, 'upload.sh')
+    if not upload_script.exists() or upload_script.read_text() != UPLOAD_SCRIPT:
+        upload_script.write_text(UPLOAD_SCRIPT)
+        upload_script.chmod(0o755)
 
     print("\n" + "=" * 60)
     print("All binaries generated successfully!")
@@ -7,13 +7,23 @@ Command-line interface for NXP Gold Box SJA1110 switch control
 import os
 import sys
 import json
+import mmap
 import time
 import serial
+import struct
 import logging
 import argparse
+import selectors
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 
+# Faster JSON parsing when available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Add src directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
@@ -21,9 +31,46 @@ from sja1110_driver import SJA1110Driver
 from sja1110_frer import SJA1110FRER, StreamIdentification, FRERAlgorithm
 from sja1110_firmware_builder import SJA1110FirmwareBuilder
 
+# Commands that can be run against several serial ports at once
+# ('frer' shares its frer_config.bin scratch file, 'interactive' the terminal)
+MULTI_PORT_COMMANDS = ('version', 'status', 'flash', 'reset')
+
+def validate_firmware_cached(firmware_file: str) -> bool:
+    """Validate firmware, skipping files already recorded as valid
+    
+    A <file>.validated.json sidecar stores the size and mtime of the
+    last file that passed, so re-flashing an unchanged image does not
+    re-read and re-hash it.
+    """
+    logger = logging.getLogger(__name__)
+    st = os.stat(firmware_file)
+    key = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    sidecar = firmware_file + '.validated.json'
+    
+    try:
+        with open(sidecar, 'r') as f:
+            if json.load(f) == key:
+                logger.info(f"Firmware unchanged since last validation: {firmware_file}")
+                return True
+    except (OSError, ValueError):
+        pass
+    
+    if not SJA1110FirmwareBuilder().validate_firmware(firmware_file):
+        return False
+    
+    try:
+        with open(sidecar, 'w') as f:
+            json.dump(key, f)
+    except OSError as e:
+        logger.debug(f"Could not cache validation result: {e}")
+    return True
+
 class SJA1110CLI:
     """Command-line interface for SJA1110 control"""
     
+    # Pause between bulk-write chunks when the port has no flow control
+    CHUNK_DELAY = 0.01
+    
     def __init__(self, interface: str = 'serial', **kwargs):
         """
         Initialize CLI
@@ -38,6 +85,10 @@ class SJA1110CLI:
         if interface == 'serial':
             self.serial_port = kwargs.get('port', '/dev/ttyUSB0')
             self.baudrate = kwargs.get('baudrate', 115200)
+            # RTS/CTS is opt-in: a port without the lines wired would
+            # never see CTS and block on the first write
+            self.rtscts = kwargs.get('rtscts', False)
+            self.chunk_size = kwargs.get('chunk_size')
             self._init_serial()
         else:
             self.driver = SJA1110Driver(interface=interface, **kwargs)
@@ -51,7 +102,8 @@ class SJA1110CLI:
                 timeout=1,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE
+                stopbits=serial.STOPBITS_ONE,
+                rtscts=self.rtscts
             )
             self.logger.info(f"Serial port opened: {self.serial_port} @ {self.baudrate}")
         except Exception as e:
@@ -68,20 +120,54 @@ class SJA1110CLI:
         self.serial.write(cmd_bytes)
         
         # Read response
+        return self._read_response(timeout=5).strip()
+    
+    def _read_response(self, timeout: float) -> str:
+        """Read from serial until a prompt ('>' or '#') arrives or timeout expires"""
         response = ''
-        timeout = time.time() + 5  # 5 second timeout
+        deadline = time.monotonic() + timeout
+        saved_timeout = self.serial.timeout
         
-        while time.time() < timeout:
-            if self.serial.in_waiting:
-                data = self.serial.read(self.serial.in_waiting)
+        # Set once for the whole loop: every assignment reconfigures the
+        # port. Reads still return as soon as a byte arrives, and the short
+        # timeout keeps the deadline within one poll interval
+        self.serial.timeout = min(timeout, 0.1)
+        
+        try:
+            while time.monotonic() < deadline:
+                # Block in the driver until at least one byte arrives, then
+                # take whatever else is already buffered
+                data = self.serial.read(max(1, self.serial.in_waiting))
+                if not data:
+                    continue
                 response += data.decode('utf-8', errors='ignore')
                 
                 # Check for prompt or completion
                 if '>' in response or '#' in response:
                     break
-            time.sleep(0.01)
+        finally:
+            self.serial.timeout = saved_timeout
         
-        return response.strip()
+        return response
+    
+    def _upload_chunk_size(self, unpaced: int) -> int:
+        """Bulk-write chunk size
+        
+        With flow control, slow links do best with USB full-speed packet
+        sized writes and faster ones with high-speed packets. Without it
+        the per-operation default is kept, since every chunk is followed
+        by CHUNK_DELAY.
+        """
+        if self.chunk_size:
+            return self.chunk_size
+        if self.rtscts:
+            return 64 if self.baudrate <= 115200 else 512
+        return unpaced
+    
+    def _pace(self):
+        """Give the board time to drain a chunk when nothing else paces us"""
+        if not self.rtscts:
+            time.sleep(self.CHUNK_DELAY)
     
     def get_version(self) -> str:
         """Get firmware version"""
@@ -113,8 +199,9 @@ class SJA1110CLI:
     
     def configure_frer(self, config_file: str):
         """Configure FRER from JSON file"""
-        with open(config_file, 'r') as f:
-            config = json.load(f)
+        with open(config_file, 'rb') as f:
+            raw = f.read()
+        config = orjson.loads(raw) if orjson else json.loads(raw)
         
         frer = SJA1110FRER()
         
@@ -158,46 +245,64 @@ class SJA1110CLI:
             config_data = frer.generate_configuration()
             offset = 0x060000  # FRER configuration offset
             
-            for i in range(0, len(config_data), 4):
-                value = int.from_bytes(config_data[i:i+4], 'big')
-                self.driver.write_register(offset + i, value)
+            # Decode all whole words in one C-level pass; a trailing partial
+            # word is written on its own, as before
+            whole = len(config_data) - len(config_data) % 4
+            words = struct.iter_unpack('>I', memoryview(config_data)[:whole])
+            for address, (value,) in zip(range(offset, offset + whole, 4), words):
+                self.driver.write_register(address, value)
+            if whole < len(config_data):
+                self.driver.write_register(offset + whole, int.from_bytes(config_data[whole:], 'big'))
         
         self.logger.info("FRER configuration applied")
     
     def _upload_config(self, filename: str):
         """Upload configuration file to Gold Box"""
-        with open(filename, 'rb') as f:
-            data = f.read()
+        # mmap cannot map an empty file, and there is nothing to upload
+        if os.path.getsize(filename) == 0:
+            raise ValueError(f"Configuration file is empty: {filename}")
         
-        # Send upload command
-        response = self.send_command(f'upload {len(data)}')
-        
-        if 'ready' not in response.lower():
-            raise RuntimeError(f"Upload failed: {response}")
-        
-        # Send data in chunks
-        chunk_size = 256
-        for i in range(0, len(data), chunk_size):
-            chunk = data[i:i+chunk_size]
-            self.serial.write(chunk)
-            time.sleep(0.01)  # Small delay between chunks
+        # Map the file rather than reading it into memory
+        with open(filename, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Send upload command
+            response = self.send_command(f'upload {len(data)}')
+            
+            if 'ready' not in response.lower():
+                raise RuntimeError(f"Upload failed: {response}")
+            
+            # Send data in chunks
+            chunk_size = self._upload_chunk_size(256)
+            for i in range(0, len(data), chunk_size):
+                chunk = data[i:i+chunk_size]
+                self.serial.write(chunk)
+                self._pace()
+            self.serial.flush()
         
-        # Wait for confirmation
-        response = self.serial.read(100).decode('utf-8', errors='ignore')
+        # Wait for confirmation (returns as soon as 'success' arrives)
+        response = self.serial.read_until(b'success', size=100).decode('utf-8', errors='ignore')
         
         if 'success' in response.lower():
             self.logger.info(f"Configuration uploaded: {filename}")
         else:
             raise RuntimeError(f"Upload failed: {response}")
     
-    def flash_firmware(self, firmware_file: str):
-        """Flash firmware to Gold Box"""
+    def flash_firmware(self, firmware_file: str, validate: bool = True,
+                       show_progress: bool = True):
+        """
+        Flash firmware to Gold Box
+        
+        Args:
+            firmware_file: Firmware binary file
+            validate: Check the image first; pass False when the caller
+                already validated it
+            show_progress: Redraw a progress line on stdout
+        """
         if self.interface != 'serial':
             raise RuntimeError("Firmware flashing requires serial interface")
         
         # Validate firmware
-        builder = SJA1110FirmwareBuilder()
-        if not builder.validate_firmware(firmware_file):
+        if validate and not validate_firmware_cached(firmware_file):
             raise ValueError("Invalid firmware file")
         
         file_size = os.path.getsize(firmware_file)
@@ -214,26 +319,31 @@ class SJA1110CLI:
         if 'ready' not in response.lower():
             raise RuntimeError(f"Flash preparation failed: {response}")
         
-        # Send firmware data
-        with open(firmware_file, 'rb') as f:
-            chunk_size = 1024
-            total_sent = 0
+        # Send firmware data straight from a read-only mapping of the image;
+        # each chunk is a view into it, released before the next one so
+        # the mapping can be closed even if a write fails
+        with open(firmware_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image, \
+                memoryview(image) as view:
+            chunk_size = self._upload_chunk_size(1024)
+            last_percent = -1
             
-            while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                
-                self.serial.write(chunk)
-                total_sent += len(chunk)
+            for offset in range(0, len(view), chunk_size):
+                with view[offset:offset + chunk_size] as chunk:
+                    self.serial.write(chunk)
+                    total_sent = offset + len(chunk)
+                self._pace()
                 
-                # Progress update
+                # Progress update (redrawn only when the whole percentage changes)
                 progress = (total_sent / file_size) * 100
-                print(f"\rFlashing: {progress:.1f}%", end='')
-                
-                time.sleep(0.01)
+                if show_progress and int(progress) != last_percent:
+                    last_percent = int(progress)
+                    print(f"\rFlashing: {progress:.1f}%", end='')
+            
+            self.serial.flush()
         
-        print()  # New line after progress
+        if show_progress:
+            print()  # New line after progress
         
         # Wait for flash completion
         timeout = time.time() + 30  # 30 second timeout
@@ -268,6 +378,139 @@ class SJA1110CLI:
             self.driver.close()
 
 
+def run_interactive_command(cli: SJA1110CLI, cmd: str) -> bool:
+    """Run one interactive-mode command; returns False on 'exit'"""
+    if cmd == 'exit':
+        return False
+    elif cmd == 'help':
+        print("Commands:")
+        print("  version  - Get firmware version")
+        print("  status   - Get switch status")
+        print("  reset    - Reset switch")
+        print("  exit     - Exit interactive mode")
+    elif cmd == 'version':
+        print(cli.get_version())
+    elif cmd == 'status':
+        status = cli.get_status()
+        print(json.dumps(status, indent=2))
+    elif cmd == 'reset':
+        cli.reset()
+        print("Switch reset")
+    elif cmd:
+        # Send raw command
+        response = cli.send_command(cmd)
+        print(response)
+    return True
+
+
+def interactive_mode(cli: SJA1110CLI):
+    """Interactive command loop
+    
+    On a serial connection stdin and the port are watched together, so
+    unsolicited switch output (link events etc.) is shown as it arrives
+    instead of ending up in the next command's response.
+    """
+    print("SJA1110 Interactive Mode")
+    print("Type 'help' for commands, 'exit' to quit")
+    
+    if not hasattr(cli, 'serial') or os.name == 'nt':
+        # No serial port to watch (or no select() on Windows consoles)
+        while True:
+            try:
+                if not run_interactive_command(cli, input("> ").strip()):
+                    return
+            except KeyboardInterrupt:
+                print("\nUse 'exit' to quit")
+            except Exception as e:
+                print(f"Error: {e}")
+    
+    sel = selectors.DefaultSelector()
+    sel.register(cli.serial, selectors.EVENT_READ, 'serial')
+    sel.register(sys.stdin, selectors.EVENT_READ, 'stdin')
+    print("> ", end='', flush=True)
+    pending = ''
+    
+    try:
+        while True:
+            try:
+                # Drain the port before acting on a command line
+                events = sorted(sel.select(), key=lambda event: event[0].data != 'serial')
+                for key, _ in events:
+                    if key.data == 'serial':
+                        data = cli.serial.read(cli.serial.in_waiting or 1)
+                        print(data.decode('utf-8', errors='ignore'), end='', flush=True)
+                        continue
+                    
+                    # Read the fd directly: a buffered readline() could pull in
+                    # several lines that select() would then never report
+                    data = os.read(sys.stdin.fileno(), 4096)
+                    if not data:
+                        return
+                    pending += data.decode('utf-8', errors='ignore')
+                    while '\n' in pending:
+                        line, pending = pending.split('\n', 1)
+                        if not run_interactive_command(cli, line.strip()):
+                            return
+                    print("> ", end='', flush=True)
+            except KeyboardInterrupt:
+                print("\nUse 'exit' to quit")
+                print("> ", end='', flush=True)
+            except Exception as e:
+                print(f"Error: {e}")
+                print("> ", end='', flush=True)
+    finally:
+        sel.close()
+
+
+def run_command(cli: SJA1110CLI, args: argparse.Namespace, label: str = ''):
+    """Execute a device command on an open connection
+    
+    With a label (one of several ports), output lines are prefixed with
+    it, the flash progress line is left out and the firmware is taken as
+    already validated.
+    """
+    prefix = f"{label}: " if label else ''
+    
+    if args.command == 'version':
+        version = cli.get_version()
+        print(f"{prefix}Version: {version}")
+        
+    elif args.command == 'status':
+        status = cli.get_status()
+        print(f"{prefix}Switch Status:\n{json.dumps(status, indent=2)}")
+        
+    elif args.command == 'frer':
+        cli.configure_frer(args.config)
+        print("FRER configuration applied")
+        
+    elif args.command == 'flash':
+        cli.flash_firmware(args.firmware, validate=not label, show_progress=not label)
+        print(f"{prefix}Firmware flashed successfully")
+        
+    elif args.command == 'reset':
+        cli.reset()
+        print(f"{prefix}Switch reset")
+        
+    elif args.command == 'interactive':
+        interactive_mode(cli)
+
+
+def run_on_port(args: argparse.Namespace, port: str, label: str = ''):
+    """Open a connection on port, run the command and close it again"""
+    cli = SJA1110CLI(
+        interface=args.interface,
+        port=port,
+        baudrate=args.baudrate,
+        rtscts=args.rtscts,
+        chunk_size=args.chunk_size
+    )
+    
+    try:
+        run_command(cli, args, label)
+    finally:
+        cli.close()
+
+
 def main():
     """Main CLI entry point"""
     parser = argparse.ArgumentParser(description='SJA1110 Gold Box Control Tool')
@@ -279,11 +522,19 @@ def main():
                        help='Communication interface')
     parser.add_argument('-p', '--port', 
                        default='/dev/ttyUSB0',
-                       help='Serial port (for serial interface)')
+                       help='Serial port (for serial interface); comma-separated for several boards')
     parser.add_argument('-b', '--baudrate',
                        type=int,
                        default=115200,
                        help='Serial baudrate')
+    parser.add_argument('--rtscts',
+                       action='store_true',
+                       help='Use RTS/CTS flow control instead of fixed upload pacing '
+                            '(needs the RTS/CTS lines wired)')
+    parser.add_argument('--chunk-size',
+                       type=int,
+                       help='Serial upload chunk size in bytes '
+                            '(default: by baudrate with --rtscts, else 256 for uploads, 1024 for flashing)')
     
     # Commands
     subparsers = parser.add_subparsers(dest='command', help='Commands')
@@ -331,71 +582,31 @@ def main():
         print(f"Firmware built: {firmware_file}")
         
     elif args.command:
-        # Initialize CLI
-        cli = SJA1110CLI(
-            interface=args.interface,
-            port=args.port,
-            baudrate=args.baudrate
-        )
+        ports = args.port.split(',')
         
-        try:
-            if args.command == 'version':
-                version = cli.get_version()
-                print(f"Version: {version}")
-                
-            elif args.command == 'status':
-                status = cli.get_status()
-                print("Switch Status:")
-                print(json.dumps(status, indent=2))
-                
-            elif args.command == 'frer':
-                cli.configure_frer(args.config)
-                print("FRER configuration applied")
-                
-            elif args.command == 'flash':
-                cli.flash_firmware(args.firmware)
-                print("Firmware flashed successfully")
-                
-            elif args.command == 'reset':
-                cli.reset()
-                print("Switch reset")
-                
-            elif args.command == 'interactive':
-                print("SJA1110 Interactive Mode")
-                print("Type 'help' for commands, 'exit' to quit")
-                
-                while True:
-                    try:
-                        cmd = input("> ").strip()
-                        
-                        if cmd == 'exit':
-                            break
-                        elif cmd == 'help':
-                            print("Commands:")
-                            print("  version  - Get firmware version")
-                            print("  status   - Get switch status")
-                            print("  reset    - Reset switch")
-                            print("  exit     - Exit interactive mode")
-                        elif cmd == 'version':
-                            print(cli.get_version())
-                        elif cmd == 'status':
-                            status = cli.get_status()
-                            print(json.dumps(status, indent=2))
-                        elif cmd == 'reset':
-                            cli.reset()
-                            print("Switch reset")
-                        elif cmd:
-                            # Send raw command
-                            response = cli.send_command(cmd)
-                            print(response)
-                            
-                    except KeyboardInterrupt:
-                        print("\nUse 'exit' to quit")
-                    except Exception as e:
-                        print(f"Error: {e}")
-                
-        finally:
-            cli.close()
+        if len(ports) == 1:
+            run_on_port(args, ports[0])
+        elif args.interface != 'serial' or args.command not in MULTI_PORT_COMMANDS:
+            parser.error(f"several ports are only supported for serial "
+                         f"{', '.join(MULTI_PORT_COMMANDS)}")
+        else:
+            # Validate the image once, before any worker opens a port
+            if args.command == 'flash' and not validate_firmware_cached(args.firmware):
+                print("Error: Invalid firmware file")
+                sys.exit(1)
+            
+            # Each board has its own serial link, so driving them from one
+            # worker each takes about as long as a single board
+            with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+                futures = {port: pool.submit(run_on_port, args, port, port) for port in ports}
+            
+            failed = False
+            for port, future in futures.items():
+                if future.exception():
+                    print(f"{port}: Error: {future.exception()}")
+                    failed = True
+            if failed:
+                sys.exit(1)
     
     else:
         parser.print_help()
@@ -6,10 +6,13 @@ Based on NXP's official driver implementation
 
 import os
 import sys
+import mmap
 import time
+import shutil
 import struct
 import logging
 import argparse
+from contextlib import contextmanager
 from pathlib import Path
 
 # Try to import SPI/serial libraries
@@ -25,6 +28,50 @@ try:
 except ImportError:
     HAS_SERIAL = False
 
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from sja1110_common import spi_burst_words, spi_send
+
+@contextmanager
+def map_file(path):
+    """Map a file read-only instead of reading it into a bytes copy"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map an empty file
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def copy_image(src, dst, prefix=b''):
+    """Copy src to dst after prefix, in the kernel where possible"""
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fdst.write(prefix)
+        fdst.flush()
+        
+        try:
+            size = os.fstat(fsrc.fileno()).st_size
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(fdst.fileno(), fsrc.fileno(), offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except (AttributeError, OSError):
+            # No sendfile() for this platform or file pair
+            fsrc.seek(0)
+            fdst.seek(len(prefix))
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+
+
+def _same_file(path, other):
+    """True if both paths name the same existing file"""
+    return os.path.exists(other) and os.path.samefile(path, other)
+
+
 class SJA1110Uploader:
     """Upload firmware and configuration to SJA1110"""
     
@@ -39,6 +86,11 @@ class SJA1110Uploader:
     RESET_CTRL_ADDR = 0x1C6000
     CONFIG_START_ADDR = 0x020000
     
+    # SPI frame header: command byte followed by the 24-bit address
+    SPI_HEADER = struct.Struct('>I')
+    SPI_CMD_READ = 0x00 << 24
+    SPI_CMD_WRITE = 0x80 << 24
+    
     # Device ID for SJA1110
     SJA1110_DEVICE_ID = 0xB700030E
     
@@ -70,6 +122,9 @@ class SJA1110Uploader:
             self.spi = spidev.SpiDev()
             self.spi.open(kwargs.get('bus', 0), kwargs.get('device', 0))
             self.spi.max_speed_hz = kwargs.get('speed', 10000000)
+            # Bytes per SPI burst: at most 64 words per [CMD][ADDR] header,
+            # and never more than one spidev transfer
+            self.burst_size = 4 * spi_burst_words()
         elif interface == 'serial':
             if not HAS_SERIAL:
                 raise ImportError("pyserial not installed")
@@ -117,35 +172,41 @@ class SJA1110Uploader:
         if not os.path.exists(config_file):
             raise FileNotFoundError(f"Configuration file not found: {config_file}")
         
-        with open(config_file, 'rb') as f:
-            config_data = f.read()
-        
-        # Verify marker
-        if not config_data.startswith(self.IMAGE_VALID_MARKER):
-            self.logger.warning("Configuration missing valid marker, adding...")
-            config_data = self.IMAGE_VALID_MARKER + config_data
-        
-        self.logger.info(f"Uploading switch configuration: {config_file} ({len(config_data)} bytes)")
-        
-        if self.interface == 'sysfs':
-            # Copy to firmware directory
-            fw_dir = '/lib/firmware'
-            fw_path = os.path.join(fw_dir, os.path.basename(config_file))
+        with map_file(config_file) as config_data:
+            # Verify marker; a missing one is sent ahead of the image rather
+            # than concatenated onto a copy of it
+            prefix = b''
+            if config_data[:len(self.IMAGE_VALID_MARKER)] != self.IMAGE_VALID_MARKER:
+                self.logger.warning("Configuration missing valid marker, adding...")
+                prefix = self.IMAGE_VALID_MARKER
             
-            with open(fw_path, 'wb') as f:
-                f.write(config_data)
+            self.logger.info(f"Uploading switch configuration: {config_file} ({len(prefix) + len(config_data)} bytes)")
             
-            # Trigger upload via sysfs
-            upload_file = os.path.join(self.switch_path, 'switch_cfg_upload')
-            if os.path.exists(upload_file):
-                with open(upload_file, 'w') as f:
-                    f.write(os.path.basename(config_file))
-            else:
-                self.logger.warning(f"sysfs upload file not found: {upload_file}")
-        
-        elif self.interface == 'spi':
-            # Direct SPI upload
-            self._upload_via_spi(config_data, is_switch_config=True)
+            if self.interface == 'sysfs':
+                # Copy to firmware directory
+                fw_dir = '/lib/firmware'
+                fw_path = os.path.join(fw_dir, os.path.basename(config_file))
+                
+                if not _same_file(config_file, fw_path):
+                    copy_image(config_file, fw_path, prefix)
+                elif prefix:
+                    # Rewriting the mapped file in place would truncate it under us
+                    config_data = bytes(config_data)
+                    with open(fw_path, 'wb') as f:
+                        f.write(prefix)
+                        f.write(config_data)
+            
+                # Trigger upload via sysfs
+                upload_file = os.path.join(self.switch_path, 'switch_cfg_upload')
+                if os.path.exists(upload_file):
+                    with open(upload_file, 'w') as f:
+                        f.write(os.path.basename(config_file))
+                else:
+                    self.logger.warning(f"sysfs upload file not found: {upload_file}")
+            
+            elif self.interface == 'spi':
+                # Direct SPI upload
+                self._upload_via_spi(config_data, is_switch_config=True, prefix=prefix)
         
         self.logger.info("Switch configuration upload complete")
     
@@ -163,36 +224,33 @@ class SJA1110Uploader:
                 self.logger.warning("Microcontroller firmware not found, skipping")
                 return
         
-        with open(firmware_file, 'rb') as f:
-            fw_data = f.read()
-        
-        self.logger.info(f"Uploading uC firmware: {firmware_file} ({len(fw_data)} bytes)")
-        
-        if self.interface == 'sysfs':
-            # Copy to firmware directory if needed
-            fw_dir = '/lib/firmware'
-            fw_path = os.path.join(fw_dir, os.path.basename(firmware_file))
+        with map_file(firmware_file) as fw_data:
+            self.logger.info(f"Uploading uC firmware: {firmware_file} ({len(fw_data)} bytes)")
             
-            if firmware_file != fw_path:
-                with open(fw_path, 'wb') as f:
-                    f.write(fw_data)
+            if self.interface == 'sysfs':
+                # Copy to firmware directory if needed
+                fw_dir = '/lib/firmware'
+                fw_path = os.path.join(fw_dir, os.path.basename(firmware_file))
             
-            # Trigger upload via sysfs
-            upload_file = os.path.join(self.uc_path, 'uc_fw_upload')
-            if os.path.exists(upload_file):
-                with open(upload_file, 'w') as f:
-                    f.write(os.path.basename(firmware_file))
-            else:
-                self.logger.warning(f"sysfs upload file not found: {upload_file}")
-        
-        elif self.interface == 'spi':
-            # Direct SPI upload
-            self._upload_via_spi(fw_data, is_switch_config=False)
+                if not _same_file(firmware_file, fw_path):
+                    copy_image(firmware_file, fw_path)
+            
+                # Trigger upload via sysfs
+                upload_file = os.path.join(self.uc_path, 'uc_fw_upload')
+                if os.path.exists(upload_file):
+                    with open(upload_file, 'w') as f:
+                        f.write(os.path.basename(firmware_file))
+                else:
+                    self.logger.warning(f"sysfs upload file not found: {upload_file}")
+            
+            elif self.interface == 'spi':
+                # Direct SPI upload
+                self._upload_via_spi(fw_data, is_switch_config=False)
         
         self.logger.info("Microcontroller firmware upload complete")
     
-    def _upload_via_spi(self, data, is_switch_config=True):
-        """Upload data via SPI interface"""
+    def _upload_via_spi(self, data, is_switch_config=True, prefix=b''):
+        """Upload data via SPI interface, optionally preceded by prefix"""
         if not HAS_SPI:
             raise RuntimeError("SPI not available")
         
@@ -202,63 +260,59 @@ class SJA1110Uploader:
         else:
             base_addr = 0x000000  # uC firmware starts at 0
         
+        if prefix:
+            self._spi_write_block(base_addr, prefix)
+            base_addr += len(prefix)
+        
         # Upload in chunks
-        chunk_size = 256
+        chunk_size = self.burst_size
         total_chunks = (len(data) + chunk_size - 1) // chunk_size
+        last_percent = -1
         
-        for i in range(0, len(data), chunk_size):
-            chunk = data[i:i+chunk_size]
-            addr = base_addr + i
-            
-            # Write chunk
-            self._spi_write_block(addr, chunk)
-            
-            # Progress
-            current_chunk = i // chunk_size + 1
-            progress = (current_chunk / total_chunks) * 100
-            print(f"\rUploading: {progress:.1f}%", end='')
+        # Chunks are views into data, copied only into the SPI frame; none
+        # may outlive the view, or a mapped image could not be closed
+        with memoryview(data) as view:
+            for i in range(0, len(view), chunk_size):
+                addr = base_addr + i
+                
+                # Write chunk
+                self._spi_write_block(addr, view[i:i+chunk_size])
+                
+                # Progress (redrawn only when the whole percentage changes)
+                current_chunk = i // chunk_size + 1
+                progress = (current_chunk / total_chunks) * 100
+                if int(progress) != last_percent:
+                    last_percent = int(progress)
+                    print(f"\rUploading: {progress:.1f}%", end='')
         
         print()  # New line after progress
     
     def _spi_read(self, address, length=4):
         """Read from SPI"""
         # SJA1110 SPI protocol: [CMD][ADDR][DATA]
-        cmd = 0x00  # Read command
-        addr_bytes = [(address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
-        
-        tx_data = [cmd] + addr_bytes + [0x00] * length
-        rx_data = self.spi.xfer2(tx_data)
+        tx_data = bytearray(4 + length)
+        self.SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_READ | (address & 0xFFFFFF))
+        rx_data = self.spi.xfer2(list(tx_data))
         
         # Extract value
-        value = 0
-        for i in range(length):
-            value = (value << 8) | rx_data[4 + i]
-        
-        return value
+        return int.from_bytes(bytes(rx_data[4:4 + length]), 'big')
     
     def _spi_write(self, address, value, length=4):
         """Write to SPI"""
         # SJA1110 SPI protocol: [CMD][ADDR][DATA]
-        cmd = 0x80  # Write command
-        addr_bytes = [(address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
-        
-        data_bytes = []
-        for i in range(length):
-            data_bytes.append((value >> (8 * (length - 1 - i))) & 0xFF)
-        
-        tx_data = [cmd] + addr_bytes + data_bytes
-        self.spi.xfer2(tx_data)
+        tx_data = bytearray(4 + length)
+        self.SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_WRITE | (address & 0xFFFFFF))
+        tx_data[4:] = (value & ((1 << (8 * length)) - 1)).to_bytes(length, 'big')
+        spi_send(self.spi, tx_data)
     
     def _spi_write_block(self, address, data):
         """Write block of data to SPI"""
-        # Write data in 32-bit words
-        for i in range(0, len(data), 4):
-            word_data = data[i:i+4]
-            if len(word_data) < 4:
-                word_data += b'\x00' * (4 - len(word_data))
-            
-            value = struct.unpack('>I', word_data)[0]
-            self._spi_write(address + i, value, 4)
+        # One burst per block: the SJA1110 auto-increments the address, so
+        # [CMD][ADDR][DATA...] replaces a separate transfer per 32-bit word
+        tx_data = bytearray(4 + len(data) + (-len(data) % 4))
+        self.SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_WRITE | (address & 0xFFFFFF))
+        tx_data[4:4 + len(data)] = data
+        spi_send(self.spi, tx_data)
     
     def close(self):
         """Close connections"""
@@ -9,10 +9,21 @@ import json
 import logging
 import argparse
 from typing import List, Dict, Tuple, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import IntEnum
 from datetime import datetime
 
+from sja1110_common import crc32, build_key, key_matches, write_key
+
+# Table entry layouts, compiled once
+_CB_SEQ = struct.Struct('<HHxBH')   # [stream_id:16][port_mask:16][pad][flags:8][seq_num:16]
+_CB_REC = struct.Struct('<HBBHH')   # [stream_id:16][port:8][flags:8][history:16][timeout:16]
+_DPI = struct.Struct('<HHBBB')      # [stream_id:16][vlan_id:16][priority:8][ingress_port:8][flags:8]
+_VLAN = struct.Struct('<I')         # [vlan_id:12][port_mask:11][flags:9]
+_HEADER = struct.Struct('<8sII')    # [valid marker:64][device_id:32][config flags:32]
+_GENERAL = struct.Struct('<IBB')    # [FRMREPEN:32][host_port:8][cascade_port:8]
+_CRC = struct.Struct('<I')          # [crc32:32]
+
 # Gold Box Physical Port to SJA1110 Internal Port Mapping
 class GoldBoxPort(IntEnum):
     """Gold Box Physical Port Mapping"""
@@ -37,6 +48,21 @@ class GoldBoxPort(IntEnum):
     P3B_PFE2 = 21     # 1000BASE-T -> S32G PFE_MAC2 (not SJA1110)
     P5_PFE1 = 22      # 1000BASE-T -> S32G PFE_MAC1 (not SJA1110)
 
+# Friendly names indexed by SJA1110 port (port 0 is reserved)
+_PORT_NAMES = (
+    None,
+    "P1 (100BASE-TX)",
+    "P2A (1000BASE-T)",
+    "P2B (1000BASE-T)",
+    "PFE_MAC0 (SGMII)",
+    "P6 (100BASE-T1)",
+    "P7 (100BASE-T1)",
+    "P8 (100BASE-T1)",
+    "P9 (100BASE-T1)",
+    "P10 (100BASE-T1)",
+    "P11 (100BASE-T1)",
+)
+
 @dataclass
 class FRERTestScenario:
     """FRER Test Scenario Definition"""
@@ -48,6 +74,9 @@ class FRERTestScenario:
     vlan_id: int
     priority: int
     expected_behavior: str
+    stream_id: int = 0  # Derived from name in add_test_scenario
+    replicate_mask: int = 0  # Bitmask of replicate_to, set in add_test_scenario
+    member_mask: int = 0  # replicate_mask plus input/elimination ports
 
 class GoldBoxFRERConfig:
     """Gold Box FRER Configuration Generator"""
@@ -59,50 +88,21 @@ class GoldBoxFRERConfig:
     DPI_CONFIG_BASE = 0x0A0000
     VLAN_TABLE_BASE = 0x040000
     
+    # Ports reachable through SJA1110 (Port 0 is reserved)
+    VALID_SJA_PORTS = frozenset(range(1, 11))
+    
     # CB Table Entry Sizes
     CB_SEQ_GEN_ENTRY_SIZE = 16
     CB_IND_REC_ENTRY_SIZE = 20
     
-    def __init__(self):
-        self.logger = logging.getLogger(__name__)
-        self.test_scenarios: List[FRERTestScenario] = []
-        self.config_data = bytearray()
-        
-    def validate_port(self, port: int, port_name: str = "") -> bool:
-        """Validate if port can be used in SJA1110"""
-        # Ports 20-22 are direct S32G connections, not through SJA1110
-        if port >= 20:
-            self.logger.warning(f"{port_name} (port {port}) is directly connected to S32G, not through SJA1110")
-            return False
-        
-        # Valid SJA1110 ports are 1-10 (Port 0 is reserved)
-        if port < 1 or port > 10:
-            self.logger.error(f"Invalid SJA1110 port: {port}")
-            return False
-            
-        return True
-    
-    def add_test_scenario(self, scenario: FRERTestScenario):
-        """Add FRER test scenario with validation"""
-        # Validate input port
-        if not self.validate_port(scenario.input_port, f"Input {scenario.name}"):
-            raise ValueError(f"Invalid input port for scenario {scenario.name}")
-        
-        # Validate replication ports
-        for port in scenario.replicate_to:
-            if not self.validate_port(port, f"Replication {scenario.name}"):
-                raise ValueError(f"Invalid replication port for scenario {scenario.name}")
-        
-        # Validate elimination port if specified
-        if scenario.eliminate_at and not self.validate_port(scenario.eliminate_at, f"Elimination {scenario.name}"):
-            raise ValueError(f"Invalid elimination port for scenario {scenario.name}")
-        
-        self.test_scenarios.append(scenario)
-        self.logger.info(f"Added scenario: {scenario.name}")
+    # DPI / VLAN entry sizes as packed by generate_dpi_config / _add_vlan_config
+    DPI_ENTRY_SIZE = _DPI.size
+    VLAN_ENTRY_SIZE = _VLAN.size
     
-    def create_pfe_to_external_redundancy(self):
-        """Scenario 1: PFE to External Port Redundancy"""
-        scenario = FRERTestScenario(
+    # Predefined test scenarios, in the order they are laid out in the binary
+    SCENARIOS = {
+        # Scenario 1: PFE to External Port Redundancy
+        'pfe_external': FRERTestScenario(
             name="PFE_to_P2AB",
             description="Traffic from PFE replicated to P2A and P2B for redundancy",
             input_port=GoldBoxPort.PFE_MAC0,
@@ -111,12 +111,9 @@ class GoldBoxFRERConfig:
             vlan_id=100,
             priority=7,
             expected_behavior="Frames from PFE_MAC0 duplicated to both P2A and P2B"
-        )
-        self.add_test_scenario(scenario)
-    
-    def create_external_to_pfe_redundancy(self):
-        """Scenario 2: External to PFE with Redundancy"""
-        scenario = FRERTestScenario(
+        ),
+        # Scenario 2: External to PFE with Redundancy
+        'external_pfe': FRERTestScenario(
             name="P2A_to_PFE",
             description="External traffic from P2A replicated through T1 ports, eliminated at PFE",
             input_port=GoldBoxPort.P2A_1000T,
@@ -125,12 +122,9 @@ class GoldBoxFRERConfig:
             vlan_id=200,
             priority=6,
             expected_behavior="Frames from P2A sent through P6/P7, duplicates removed at PFE"
-        )
-        self.add_test_scenario(scenario)
-    
-    def create_t1_ring_redundancy(self):
-        """Scenario 3: 100BASE-T1 Ring Redundancy"""
-        scenario = FRERTestScenario(
+        ),
+        # Scenario 3: 100BASE-T1 Ring Redundancy
+        't1_ring': FRERTestScenario(
             name="T1_Ring",
             description="100BASE-T1 ring redundancy for automotive applications",
             input_port=GoldBoxPort.P6_T1,
@@ -139,12 +133,9 @@ class GoldBoxFRERConfig:
             vlan_id=300,
             priority=5,
             expected_behavior="T1 traffic replicated through ring, eliminated at P10"
-        )
-        self.add_test_scenario(scenario)
-    
-    def create_critical_control_redundancy(self):
-        """Scenario 4: Triple Redundancy for Critical Control"""
-        scenario = FRERTestScenario(
+        ),
+        # Scenario 4: Triple Redundancy for Critical Control
+        'critical': FRERTestScenario(
             name="Critical_Control",
             description="Triple redundancy for safety-critical control messages",
             input_port=GoldBoxPort.P1_100TX,
@@ -153,155 +144,195 @@ class GoldBoxFRERConfig:
             vlan_id=10,
             priority=7,  # Highest priority
             expected_behavior="Critical messages triplicated, PFE receives single copy"
-        )
-        self.add_test_scenario(scenario)
+        ),
+    }
+    
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.test_scenarios: List[FRERTestScenario] = []
+        self.config_data = bytearray()
+        
+    def validate_port(self, port: int, port_name: str = "") -> bool:
+        """Validate if port can be used in SJA1110"""
+        # Valid SJA1110 ports are 1-10 (Port 0 is reserved)
+        if port in self.VALID_SJA_PORTS:
+            return True
+        
+        # Ports 20-22 are direct S32G connections, not through SJA1110
+        if port >= 20:
+            self.logger.warning(f"{port_name} (port {port}) is directly connected to S32G, not through SJA1110")
+            return False
+        
+        self.logger.error(f"Invalid SJA1110 port: {port}")
+        return False
+    
+    def add_test_scenario(self, scenario: FRERTestScenario):
+        """Add FRER test scenario with validation"""
+        # Validate input port
+        if not self.validate_port(scenario.input_port, f"Input {scenario.name}"):
+            raise ValueError(f"Invalid input port for scenario {scenario.name}")
+        
+        # Validate replication ports
+        for port in scenario.replicate_to:
+            if not self.validate_port(port, f"Replication {scenario.name}"):
+                raise ValueError(f"Invalid replication port for scenario {scenario.name}")
+        
+        # Validate elimination port if specified
+        if scenario.eliminate_at and not self.validate_port(scenario.eliminate_at, f"Elimination {scenario.name}"):
+            raise ValueError(f"Invalid elimination port for scenario {scenario.name}")
+        
+        # Stream handle is derived from the name once; crc32 (unlike hash())
+        # is stable across runs regardless of PYTHONHASHSEED
+        scenario.stream_id = crc32(scenario.name.encode()) & 0xFFFF
+        
+        # Port masks used by the CB and VLAN tables
+        scenario.replicate_mask = sum(1 << port for port in set(scenario.replicate_to))
+        scenario.member_mask = scenario.replicate_mask | (1 << scenario.input_port)
+        if scenario.eliminate_at:
+            scenario.member_mask |= (1 << scenario.eliminate_at)
+        
+        self.test_scenarios.append(scenario)
+        self.logger.info(f"Added scenario: {scenario.name}")
+    
+    def create(self, key: str):
+        """Add one of the predefined SCENARIOS by key"""
+        template = self.SCENARIOS[key]
+        self.add_test_scenario(replace(template, replicate_to=list(template.replicate_to)))
     
     def generate_cb_config(self, scenario: FRERTestScenario) -> bytes:
         """Generate CB (Circuit Breaker) configuration for scenario"""
-        config = bytearray()
-        
         # CB Sequence Generation Entry (for replication)
         # Format: [stream_id:16][port_mask:16][flags:8][seq_num:16]
-        stream_id = hash(scenario.name) & 0xFFFF
-        
-        # Create port mask for replication
-        port_mask = 0
-        for port in scenario.replicate_to:
-            port_mask |= (1 << port)
+        stream_id = scenario.stream_id
         
         # Pack CB sequence generation entry
-        config.extend(struct.pack('<HHxBH',
+        config = _CB_SEQ.pack(
             stream_id,
-            port_mask,
+            scenario.replicate_mask,
             0x80,  # Enable flag
             0      # Initial sequence number
-        ))
+        )
         
         # CB Individual Recovery Entry (for elimination)
         if scenario.eliminate_at:
             # Format: [stream_id:16][port:8][flags:8][history:16][timeout:16]
-            config.extend(struct.pack('<HBBHH',
+            config += _CB_REC.pack(
                 stream_id,
                 scenario.eliminate_at,
                 0x80,  # Enable flag
                 32,    # History length
                 100    # Reset timeout (ms)
-            ))
+            )
         
-        return bytes(config)
+        return config
     
     def generate_dpi_config(self, scenario: FRERTestScenario) -> bytes:
         """Generate DPI (Deep Packet Inspection) configuration"""
-        config = bytearray()
-        
-        stream_id = hash(scenario.name) & 0xFFFF
-        
         # DPI Entry Format:
         # [stream_id:16][vlan_id:16][priority:8][ingress_port:8][flags:8]
-        config.extend(struct.pack('<HHBBB',
-            stream_id,
+        return _DPI.pack(
+            scenario.stream_id,
             scenario.vlan_id,
             scenario.priority,
             scenario.input_port,
             0x01  # CB_EN flag
-        ))
-        
-        return bytes(config)
+        )
     
-    def generate_switch_binary(self) -> bytes:
-        """Generate complete sja1110_switch.bin"""
-        self.config_data = bytearray()
-        
-        # Add header with valid marker
-        self.config_data.extend(b'\x6A\xA6\x6A\xA6\x6A\xA6\x6A\xA6')
-        
-        # Device ID
-        self.config_data.extend(struct.pack('<I', 0xB700030E))
-        
-        # Configuration flags
-        config_flags = 0xF0000000  # All features enabled
-        self.config_data.extend(struct.pack('<I', config_flags))
+    def generate_switch_binary(self) -> memoryview:
+        """Generate complete sja1110_switch.bin (zero-copy view of config_data)"""
+        # DPI and VLAN entries are the last sections written, so the image
+        # size is known up front and the buffer never has to grow
+        size = (self.DPI_CONFIG_BASE
+                + len(self.test_scenarios) * (self.DPI_ENTRY_SIZE + self.VLAN_ENTRY_SIZE)
+                + 4)
+        self.config_data = bytearray(size)
+        
+        # Header: valid marker, device ID, configuration flags (all features enabled)
+        end = self._write(self.DEVICE_ID, _HEADER.pack(
+            b'\x6A\xA6\x6A\xA6\x6A\xA6\x6A\xA6',
+            0xB700030E,
+            0xF0000000
+        ))
         
         # General Parameters
-        self._add_general_params()
+        end = self._add_general_params(end)
         
         # CB Configuration
-        self._add_cb_config()
+        end = self._add_cb_config(end)
         
         # DPI Configuration
-        self._add_dpi_config()
+        end = self._add_dpi_config(end)
         
         # VLAN Configuration
-        self._add_vlan_config()
+        end = self._add_vlan_config(end)
         
         # Calculate CRC
-        import zlib
-        crc = zlib.crc32(bytes(self.config_data)) & 0xFFFFFFFF
-        self.config_data.extend(struct.pack('<I', crc))
+        with memoryview(self.config_data) as view:
+            crc = crc32(view[:end]) & 0xFFFFFFFF
+        self._write(end, _CRC.pack(crc))
         
-        return bytes(self.config_data)
+        return memoryview(self.config_data)
+    
+    def _write(self, offset: int, data: bytes) -> int:
+        """Copy data into config_data at offset and return the end offset"""
+        end = offset + len(data)
+        self.config_data[offset:end] = data
+        return end
     
-    def _add_general_params(self):
+    def _add_general_params(self, offset: int) -> int:
         """Add general parameters section"""
-        # Pad to general params offset
-        while len(self.config_data) < self.GENERAL_PARAMS:
-            self.config_data.append(0)
+        # Sections never move backwards over data already written
+        offset = max(offset, self.GENERAL_PARAMS)
         
-        # FRMREPEN (Frame Replication Enable)
-        self.config_data.extend(struct.pack('<I', 1))
-        
-        # Host port (PFE_MAC0)
-        self.config_data.append(GoldBoxPort.PFE_MAC0)
-        
-        # Cascade port (not used in single switch)
-        self.config_data.append(0xFF)
+        # FRMREPEN (Frame Replication Enable), host port (PFE_MAC0),
+        # cascade port (not used in single switch)
+        return self._write(offset, _GENERAL.pack(1, GoldBoxPort.PFE_MAC0, 0xFF))
     
-    def _add_cb_config(self):
+    def _add_cb_config(self, offset: int) -> int:
         """Add CB configuration for all scenarios"""
-        # Pad to CB config offset
-        while len(self.config_data) < self.CB_CONFIG_BASE:
-            self.config_data.append(0)
+        offset = max(offset, self.CB_CONFIG_BASE)
         
-        for scenario in self.test_scenarios:
-            cb_config = self.generate_cb_config(scenario)
-            self.config_data.extend(cb_config)
+        return self._write(offset, b''.join(
+            self.generate_cb_config(scenario) for scenario in self.test_scenarios))
     
-    def _add_dpi_config(self):
+    def _add_dpi_config(self, offset: int) -> int:
         """Add DPI configuration for all scenarios"""
-        # Pad to DPI config offset
-        while len(self.config_data) < self.DPI_CONFIG_BASE:
-            self.config_data.append(0)
+        offset = max(offset, self.DPI_CONFIG_BASE)
         
-        for scenario in self.test_scenarios:
-            dpi_config = self.generate_dpi_config(scenario)
-            self.config_data.extend(dpi_config)
+        return self._write(offset, b''.join(
+            self.generate_dpi_config(scenario) for scenario in self.test_scenarios))
     
-    def _add_vlan_config(self):
+    def _add_vlan_config(self, offset: int) -> int:
         """Add VLAN configuration"""
-        # Pad to VLAN table offset
-        while len(self.config_data) < self.VLAN_TABLE_BASE:
-            self.config_data.append(0)
+        offset = max(offset, self.VLAN_TABLE_BASE)
         
         # Add VLAN entries for each scenario
         for scenario in self.test_scenarios:
             # VLAN entry: [vlan_id:12][port_mask:11][flags:9]
-            port_mask = (1 << scenario.input_port)
-            for port in scenario.replicate_to:
-                port_mask |= (1 << port)
-            if scenario.eliminate_at:
-                port_mask |= (1 << scenario.eliminate_at)
-            
-            vlan_entry = (scenario.vlan_id & 0xFFF) | ((port_mask & 0x7FF) << 12)
-            self.config_data.extend(struct.pack('<I', vlan_entry))
+            vlan_entry = (scenario.vlan_id & 0xFFF) | ((scenario.member_mask & 0x7FF) << 12)
+            offset = self._write(offset, _VLAN.pack(vlan_entry))
+        return offset
     
-    def save_config(self, filename: str = "goldbox_frer.bin"):
-        """Save configuration to binary file"""
-        config = self.generate_switch_binary()
-        
-        with open(filename, 'wb') as f:
-            f.write(config)
-        
-        self.logger.info(f"Saved configuration to {filename} ({len(config)} bytes)")
+    def save_config(self, filename: str = "goldbox_frer.bin", force: bool = False):
+        """Save configuration to binary file
+        
+        A <filename>.key sidecar records which scenarios (and which version
+        of this generator) produced the binary, plus its size and mtime; if
+        both still match, the existing file is kept instead of being
+        regenerated. A binary overwritten since (e.g. by ./frer
+        generate-binary, which uses the same default name) is rebuilt.
+        """
+        key = build_key(__file__, self.test_scenarios)
+        if not force and key_matches(filename, key):
+            self.logger.info(f"Configuration unchanged, keeping {filename}")
+        else:
+            config = self.generate_switch_binary()
+            
+            with open(filename, 'wb') as f:
+                f.write(config)
+            write_key(filename, key)
+            
+            self.logger.info(f"Saved configuration to {filename} ({len(config)} bytes)")
         
         # Also save JSON for documentation
         self.save_test_plan(filename.replace('.bin', '_testplan.json'))
@@ -315,13 +346,20 @@ class GoldBoxFRERConfig:
             'scenarios': []
         }
         
+        # Ports repeat across scenarios, so format each label only once
+        labels = {}
+        def label(port: int) -> str:
+            if port not in labels:
+                labels[port] = f"Port {port} ({self._get_port_name(port)})"
+            return labels[port]
+        
         for scenario in self.test_scenarios:
             test_plan['scenarios'].append({
                 'name': scenario.name,
                 'description': scenario.description,
-                'input_port': f"Port {scenario.input_port} ({self._get_port_name(scenario.input_port)})",
-                'replicate_to': [f"Port {p} ({self._get_port_name(p)})" for p in scenario.replicate_to],
-                'eliminate_at': f"Port {scenario.eliminate_at} ({self._get_port_name(scenario.eliminate_at)})" if scenario.eliminate_at else "External device",
+                'input_port': label(scenario.input_port),
+                'replicate_to': [label(p) for p in scenario.replicate_to],
+                'eliminate_at': label(scenario.eliminate_at) if scenario.eliminate_at else "External device",
                 'vlan_id': scenario.vlan_id,
                 'priority': scenario.priority,
                 'expected_behavior': scenario.expected_behavior
@@ -334,19 +372,9 @@ class GoldBoxFRERConfig:
     
     def _get_port_name(self, port: int) -> str:
         """Get friendly name for port"""
-        port_names = {
-            1: "P1 (100BASE-TX)",
-            2: "P2A (1000BASE-T)",
-            3: "P2B (1000BASE-T)",
-            4: "PFE_MAC0 (SGMII)",
-            5: "P6 (100BASE-T1)",
-            6: "P7 (100BASE-T1)",
-            7: "P8 (100BASE-T1)",
-            8: "P9 (100BASE-T1)",
-            9: "P10 (100BASE-T1)",
-            10: "P11 (100BASE-T1)"
-        }
-        return port_names.get(port, f"Unknown({port})")
+        if 1 <= port < len(_PORT_NAMES):
+            return _PORT_NAMES[port]
+        return f"Unknown({port})"
 
 
 def main():
@@ -355,9 +383,11 @@ def main():
     parser.add_argument('-o', '--output', default='goldbox_frer.bin',
                        help='Output binary file')
     parser.add_argument('-s', '--scenarios', nargs='+',
-                       choices=['pfe_external', 'external_pfe', 't1_ring', 'critical'],
-                       default=['pfe_external', 'external_pfe', 't1_ring', 'critical'],
+                       choices=list(GoldBoxFRERConfig.SCENARIOS),
+                       default=list(GoldBoxFRERConfig.SCENARIOS),
                        help='Test scenarios to include')
+    parser.add_argument('-f', '--force', action='store_true',
+                       help='Regenerate the binary even if the scenarios are unchanged')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='Verbose output')
     
@@ -372,21 +402,14 @@ def main():
     # Create configuration
     config = GoldBoxFRERConfig()
     
-    # Add selected scenarios
-    if 'pfe_external' in args.scenarios:
-        config.create_pfe_to_external_redundancy()
-    
-    if 'external_pfe' in args.scenarios:
-        config.create_external_to_pfe_redundancy()
-    
-    if 't1_ring' in args.scenarios:
-        config.create_t1_ring_redundancy()
-    
-    if 'critical' in args.scenarios:
-        config.create_critical_control_redundancy()
+    # Add selected scenarios; table order (not command-line order) decides
+    # the layout, and a scenario named twice is only added once
+    for key in GoldBoxFRERConfig.SCENARIOS:
+        if key in args.scenarios:
+            config.create(key)
     
     # Save configuration
-    config.save_config(args.output)
+    config.save_config(args.output, force=args.force)
     
     # Print summary
     print("\n" + "="*60)
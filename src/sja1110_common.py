@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the SJA1110 tools
+"""
+
+import os
+import struct
+import hashlib
+
+# CRC-32 for every image trailer and checksum. python-isal computes the
+# same IEEE CRC-32 as zlib, folded with PCLMULQDQ
+try:
+    from isal.isal_zlib import crc32
+except ImportError:
+    from zlib import crc32
+
+# The SJA1110 accepts at most 64 data words after one [CMD][ADDR] header
+SPI_MAX_BURST_WORDS = 64
+
+# spidev's transfer buffer size; writebytes2() splits anything larger into
+# separate chip-select frames, which the switch would read as new headers
+SPIDEV_BUFSIZ_PATH = '/sys/module/spidev/parameters/bufsiz'
+SPIDEV_DEFAULT_BUFSIZ = 4096
+
+
+def spi_burst_words() -> int:
+    """Data words per SPI burst: the device limit, or less if the 4-byte
+    header and data would not fit one spidev transfer"""
+    try:
+        with open(SPIDEV_BUFSIZ_PATH) as f:
+            bufsiz = int(f.read())
+    except (OSError, ValueError):
+        bufsiz = SPIDEV_DEFAULT_BUFSIZ
+    return max(1, min(SPI_MAX_BURST_WORDS, (bufsiz - 4) // 4))
+
+
+
+def spi_send(spi, buf):
+    """Write-only transfer of buf on an open spidev.SpiDev"""
+    if hasattr(spi, 'writebytes2'):
+        # spidev >= 3.4 takes the buffer as-is, with no per-byte int
+        # list and no receive buffer
+        spi.writebytes2(buf)
+    else:
+        spi.xfer2(list(buf))
+
+def build_key(source_file: str, inputs) -> bytes:
+    """Cache key for a generated binary: the generator's source plus its inputs"""
+    with open(source_file, 'rb') as f:
+        key = hashlib.blake2b(f.read(), digest_size=16)
+    key.update(repr(inputs).encode())
+    return key.digest()
+
+
+def _fingerprint(filename: str) -> bytes:
+    """Size and mtime of filename, so a file rewritten by another tool no
+    longer matches the sidecar recorded when it was generated"""
+    st = os.stat(filename)
+    return struct.pack('<QQ', st.st_size, st.st_mtime_ns)
+
+
+def key_matches(filename: str, key: bytes) -> bool:
+    """True if filename is still the file written alongside key
+
+    The <filename>.key sidecar must hold key plus the size and mtime the
+    file had when write_key() was called.
+    """
+    try:
+        with open(filename + '.key', 'rb') as f:
+            return f.read() == key + _fingerprint(filename)
+    except OSError:
+        return False
+
+
+def write_key(filename: str, key: bytes):
+    """Record key and the current size/mtime of filename in its
+    <filename>.key sidecar; call once the binary has been written"""
+    with open(filename + '.key', 'wb') as f:
+        f.write(key + _fingerprint(filename))
@@ -14,221 +14,234 @@ Key findings from NXP driver:
 import struct
 import json
 import logging
+from array import array
 from typing import List, Dict
 from datetime import datetime
 
+from sja1110_common import crc32, build_key, key_matches, write_key
+
+# 64-byte UC header: exec signature at 8:10, version, load address, entry point
+_UC_HEADER = struct.Struct('<8x2s2xIII40x')
+# UC FRER control block: number of streams, FRER enabled
+_FRER_CONTROL = struct.Struct('<II')
+# Trailing image CRC32
+_CRC32 = struct.Struct('<I')
+# 56-byte switch config header: device ID, configuration flags
+_CONFIG_HEADER = struct.Struct('<II48x')
+# 256-byte General Parameters table: host port configuration
+_GENERAL_PARAMS = struct.Struct('<IIII240x')
+
+# FRER table entry layouts, compiled once
+# UC stream: stream ID, VLAN ID, priority, source port, destination count
+_STREAM_ENTRY = struct.Struct('<HHBBB')
+# CB:  stream handle, input port, output port, R-TAG type, path ID, CB_EN, 8 reserved
+_CB_ENTRY = struct.Struct('<HBBHBB8x')
+# DPI: stream handle, VLAN ID, priority, source port, CB_EN, VALID, 24 reserved/MAC
+_DPI_ENTRY = struct.Struct('<HHBBBB24x')
+
+# Per-port link speed: CPU port 1000M, RJ45 ports P1 100M / P2-P4 1G, T1 ports 100M
+_PORT_SPEEDS = (0x03, 0x02, 0x03, 0x03, 0x03, 0x02, 0x02, 0x02, 0x02, 0x02, 0x02)
+# 128-byte port entry: ENABLED, speed, INGRESS, EGRESS, rest reserved
+_PORT_CONFIG = struct.Struct('<IIII112x')
+# The port table does not depend on the streams, so build all 11 ports (0-10) once
+_PORT_CONFIG_TABLE = b''.join(_PORT_CONFIG.pack(1, speed, 1, 1) for speed in _PORT_SPEEDS)
+
 class CorrectSJA1110Firmware:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        # The logger is module-wide; only the first instance attaches a handler
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
         
         # NXP Official Constants from driver
         self.IMAGE_VALID_MARKER = bytes([0x6A, 0xA6, 0x6A, 0xA6, 0x6A, 0xA6, 0x6A, 0xA6])
+        self.MARKER_LEN = len(self.IMAGE_VALID_MARKER)
         self.HEADER_EXEC = bytes([0xDD, 0x11])
+        self.HEADER_EXEC_OFFSET = self.MARKER_LEN + 8  # Bytes 8:10 of the UC header
         self.STATUS_PKT_HEADER = 0xCC
         self.SJA1110_DEVICE_ID = 0xb700030e
         self.CONFIG_START_ADDRESS = 0x20000
         
-        # FRER streams for testing
-        self.frer_streams = []
+        # FRER streams for testing, one column per field (index = stream);
+        # the fixed-width columns are typed like their table fields
+        self._stream_columns = {
+            'stream_id': array('H'),
+            'name': [],
+            'src_port': array('B'),
+            'dst_ports': [],
+            'vlan_id': array('H'),
+            'priority': array('B'),
+        }
+    
+    @property
+    def frer_streams(self) -> List[Dict]:
+        """FRER streams as one dict per stream, in the order they were added"""
+        columns = self._stream_columns
+        return [dict(zip(columns, row)) for row in zip(*columns.values())]
         
     def add_frer_stream(self, stream_id: int, src_port: int, dst_ports: List[int], 
                        vlan_id: int = 100, priority: int = 7, name: str = ""):
         """Add FRER stream with correct format"""
-        stream = {
-            'stream_id': stream_id,
-            'name': name or f"Stream_{stream_id}",
-            'src_port': src_port,
-            'dst_ports': dst_ports,
-            'vlan_id': vlan_id,
-            'priority': priority
-        }
-        self.frer_streams.append(stream)
+        streams = self._stream_columns
+        streams['stream_id'].append(stream_id)
+        streams['name'].append(name or f"Stream_{stream_id}")
+        streams['src_port'].append(src_port)
+        streams['dst_ports'].append(dst_ports)
+        streams['vlan_id'].append(vlan_id)
+        streams['priority'].append(priority)
         self.logger.info(f"Added FRER stream: {name} ({src_port} -> {dst_ports})")
     
     def build_uc_firmware(self) -> bytes:
         """Build UC firmware with correct NXP format"""
         self.logger.info("Building UC firmware with NXP official format")
         
-        firmware = bytearray()
+        # Preallocate the whole 320K image (typical UC size) already padded with 0xFF
+        target_size = 320 * 1024
+        firmware = bytearray(b'\xFF' * target_size)
         
         # 1. Add IMAGE_VALID_MARKER at start
-        firmware.extend(self.IMAGE_VALID_MARKER)
+        offset = self.MARKER_LEN
+        firmware[0:offset] = self.IMAGE_VALID_MARKER
         
         # 2. Add firmware header structure
         # Based on typical embedded firmware layout
-        header = bytearray(64)
-        
-        # Add exec header signature
-        header[8:10] = self.HEADER_EXEC
-        
-        # Firmware version and info
-        header[12:16] = struct.pack('<I', 0x00010001)  # Version 1.1
-        header[16:20] = struct.pack('<I', 0x00008000)  # Load address
-        header[20:24] = struct.pack('<I', 0x00000000)  # Entry point
-        
-        firmware.extend(header)
+        _UC_HEADER.pack_into(firmware, offset,
+            self.HEADER_EXEC,   # Exec header signature
+            0x00010001,         # Version 1.1
+            0x00008000,         # Load address
+            0x00000000          # Entry point
+        )
+        offset += _UC_HEADER.size
         
         # 3. Add FRER configuration data
-        frer_config = bytearray()
-        
-        # FRER control structure
-        frer_header = struct.pack('<I', len(self.frer_streams))  # Number of streams
-        frer_header += struct.pack('<I', 0x00000001)  # FRER enabled
-        frer_config.extend(frer_header)
+        streams = self._stream_columns
+        _FRER_CONTROL.pack_into(firmware, offset, len(streams['stream_id']), 0x00000001)
+        offset += _FRER_CONTROL.size
         
         # Add each FRER stream
-        for stream in self.frer_streams:
+        for stream_id, vlan_id, priority, src_port, dst_ports in zip(
+                streams['stream_id'], streams['vlan_id'], streams['priority'],
+                streams['src_port'], streams['dst_ports']):
             # Stream configuration entry
-            stream_data = struct.pack('<H', stream['stream_id'])
-            stream_data += struct.pack('<H', stream['vlan_id'])
-            stream_data += struct.pack('<B', stream['priority'])
-            stream_data += struct.pack('<B', stream['src_port'])
-            stream_data += struct.pack('<B', len(stream['dst_ports']))
+            _STREAM_ENTRY.pack_into(firmware, offset,
+                stream_id,
+                vlan_id,
+                priority,
+                src_port,
+                len(dst_ports)
+            )
+            offset += _STREAM_ENTRY.size
             
-            # Destination ports
-            for dst_port in stream['dst_ports']:
-                stream_data += struct.pack('<B', dst_port)
-            
-            # Pad to 16 bytes
-            while len(stream_data) < 16:
-                stream_data += b'\x00'
-                
-            frer_config.extend(stream_data)
-        
-        # Add FRER config to firmware
-        firmware.extend(frer_config)
-        
-        # 4. Pad to proper size (typically 320K for UC firmware)
-        target_size = 320 * 1024
-        while len(firmware) < target_size - 4:
-            firmware.append(0xFF)
+            # Destination ports, padding the entry to 16 bytes
+            dst = bytes(dst_ports).ljust(16 - _STREAM_ENTRY.size, b'\x00')
+            firmware[offset:offset + len(dst)] = dst
+            offset += len(dst)
         
-        # 5. Add CRC32 checksum at end
-        import zlib
-        crc = zlib.crc32(firmware) & 0xFFFFFFFF
-        firmware.extend(struct.pack('<I', crc))
+        # 4. Add CRC32 checksum at end
+        crc = crc32(memoryview(firmware)[:target_size - _CRC32.size]) & 0xFFFFFFFF
+        _CRC32.pack_into(firmware, target_size - _CRC32.size, crc)
         
         return bytes(firmware)
     
-    def build_switch_config(self) -> bytes:
+    def build_switch_config(self) -> memoryview:
         """Build switch configuration with correct NXP format"""
         self.logger.info("Building switch configuration with NXP official format")
         
-        config = bytearray()
+        # Final size is fixed, so allocate once and write sections in place
+        target_size = 640 * 1024
+        config = bytearray(target_size)
         
         # 1. Start with IMAGE_VALID_MARKER
-        config.extend(self.IMAGE_VALID_MARKER)
+        offset = self.MARKER_LEN
+        config[0:offset] = self.IMAGE_VALID_MARKER
         
         # 2. Configuration header
-        config_header = bytearray(56)  # Standard config header size
-        
-        # Device ID
-        config_header[0:4] = struct.pack('<I', self.SJA1110_DEVICE_ID)
-        
-        # Configuration flags
-        cf_flags = 0x80000000  # CF_CONFIGS_MASK set
-        config_header[4:8] = struct.pack('<I', cf_flags)
-        
-        config.extend(config_header)
+        _CONFIG_HEADER.pack_into(config, offset,
+            self.SJA1110_DEVICE_ID,     # Device ID
+            0x80000000                  # Configuration flags: CF_CONFIGS_MASK set
+        )
         
-        # 3. Pad to CONFIG_START_ADDRESS (0x20000)
-        while len(config) < self.CONFIG_START_ADDRESS:
-            config.append(0x00)
+        # 3. Configuration data starts at CONFIG_START_ADDRESS (0x20000);
+        #    everything before it is already zero
+        offset = self.CONFIG_START_ADDRESS
         
         # 4. Add actual configuration data at CONFIG_START_ADDRESS
         
         # General Parameters table (required)
-        general_params = bytearray(256)  # Standard table size
-        
-        # Host port configuration
-        general_params[0:4] = struct.pack('<I', 0x00000000)   # HOST_PORT = 0
-        general_params[4:8] = struct.pack('<I', 0x000007FF)   # VLLUPFORMAT (all ports)
-        general_params[8:12] = struct.pack('<I', 0x00000001)  # MIRR_PTACU = 1
-        general_params[12:16] = struct.pack('<I', 0x00000001) # SWITCHID = 1
-        
-        config.extend(general_params)
-        
-        # 5. Port configuration tables
-        for port in range(11):  # SJA1110 has 11 ports (0-10)
-            port_config = bytearray(128)  # Per-port config size
-            
-            # Enable port
-            port_config[0:4] = struct.pack('<I', 0x00000001)  # ENABLED = 1
-            
-            # Speed configuration
-            if port == 0:  # CPU port
-                speed = 0x03  # 1000M
-            elif port <= 4:  # RJ45 ports
-                speed = 0x03 if port >= 2 else 0x02  # 1G or 100M
-            else:  # T1 ports
-                speed = 0x02  # 100M
-                
-            port_config[4:8] = struct.pack('<I', speed)
-            port_config[8:12] = struct.pack('<I', 0x00000001)   # INGRESS = 1
-            port_config[12:16] = struct.pack('<I', 0x00000001)  # EGRESS = 1
-            
-            config.extend(port_config)
+        _GENERAL_PARAMS.pack_into(config, offset,
+            0x00000000,     # HOST_PORT = 0
+            0x000007FF,     # VLLUPFORMAT (all ports)
+            0x00000001,     # MIRR_PTACU = 1
+            0x00000001      # SWITCHID = 1
+        )
+        offset += _GENERAL_PARAMS.size
+        
+        # 5. Port configuration tables (static, built once at import)
+        config[offset:offset + len(_PORT_CONFIG_TABLE)] = _PORT_CONFIG_TABLE
+        offset += len(_PORT_CONFIG_TABLE)
         
         # 6. FRER Configuration Tables
         
+        # Entries are packed straight into the (already zeroed) image, so
+        # no per-table scratch buffer has to be built and copied in
+        
         # Circuit Breaker (CB) table for FRER
-        cb_table = bytearray(2048)  # CB table size
+        cb_table_size = 2048  # CB table size
         
+        streams = self._stream_columns
         entry_offset = 0
-        for stream in self.frer_streams:
-            for i, dst_port in enumerate(stream['dst_ports']):
-                if entry_offset + 16 <= len(cb_table):
+        for stream_id, src_port, dst_ports in zip(
+                streams['stream_id'], streams['src_port'], streams['dst_ports']):
+            for i, dst_port in enumerate(dst_ports):
+                if entry_offset + _CB_ENTRY.size <= cb_table_size:
                     # CB entry format (based on IEEE 802.1CB)
-                    cb_entry = struct.pack('<H', stream['stream_id'])    # Stream handle
-                    cb_entry += struct.pack('<B', stream['src_port'])    # Input port  
-                    cb_entry += struct.pack('<B', dst_port)              # Output port
-                    cb_entry += struct.pack('<H', 0xF1C1)               # R-TAG type
-                    cb_entry += struct.pack('<B', i + 1)                # Path ID
-                    cb_entry += struct.pack('<B', 0x01)                 # CB_EN = 1
-                    cb_entry += b'\x00' * 8                             # Reserved
-                    
-                    cb_table[entry_offset:entry_offset+16] = cb_entry
-                    entry_offset += 16
-        
-        config.extend(cb_table)
+                    _CB_ENTRY.pack_into(config, offset + entry_offset,
+                        stream_id,              # Stream handle
+                        src_port,               # Input port
+                        dst_port,               # Output port
+                        0xF1C1,                 # R-TAG type
+                        i + 1,                  # Path ID
+                        0x01                    # CB_EN = 1
+                    )
+                    entry_offset += _CB_ENTRY.size
+        
+        offset += cb_table_size
         
         # Deep Packet Inspection (DPI) table
-        dpi_table = bytearray(1024)  # DPI table size
+        dpi_table_size = 1024  # DPI table size
         
-        for i, stream in enumerate(self.frer_streams):
-            if i * 32 + 32 <= len(dpi_table):
+        for i, (stream_id, vlan_id, priority, src_port) in enumerate(zip(
+                streams['stream_id'], streams['vlan_id'],
+                streams['priority'], streams['src_port'])):
+            if (i + 1) * _DPI_ENTRY.size <= dpi_table_size:
                 # DPI entry format
-                dpi_entry = struct.pack('<H', stream['stream_id'])   # Stream handle
-                dpi_entry += struct.pack('<H', stream['vlan_id'])    # VLAN ID
-                dpi_entry += struct.pack('<B', stream['priority'])   # Priority
-                dpi_entry += struct.pack('<B', stream['src_port'])   # Source port
-                dpi_entry += struct.pack('<B', 0x01)                # CB_EN = 1
-                dpi_entry += struct.pack('<B', 0x01)                # VALID = 1
-                dpi_entry += b'\x00' * 24                           # Reserved/MAC fields
-                
-                dpi_table[i*32:(i*32)+32] = dpi_entry
-        
-        config.extend(dpi_table)
+                _DPI_ENTRY.pack_into(config, offset + i * _DPI_ENTRY.size,
+                    stream_id,              # Stream handle
+                    vlan_id,                # VLAN ID
+                    priority,               # Priority
+                    src_port,               # Source port
+                    0x01,                   # CB_EN = 1
+                    0x01                    # VALID = 1
+                )
+        
+        offset += dpi_table_size
         
         # 7. Pad to final size and add checksum
         # Typical switch config is around 600-700KB
-        target_size = 640 * 1024
-        while len(config) < target_size - 4:
-            config.append(0xFF)
+        config[offset:target_size - 4] = b'\xFF' * (target_size - 4 - offset)
         
         # Add CRC32 checksum
-        import zlib
-        crc = zlib.crc32(config) & 0xFFFFFFFF
-        config.extend(struct.pack('<I', crc))
+        with memoryview(config) as view:
+            crc = crc32(view[:target_size - 4]) & 0xFFFFFFFF
+        _CRC32.pack_into(config, target_size - _CRC32.size, crc)
         
-        return bytes(config)
+        return memoryview(config)
     
-    def validate_firmware(self, uc_firmware: bytes, switch_config: bytes) -> bool:
+    def validate_firmware(self, uc_firmware: bytes, switch_config: memoryview) -> bool:
         """Validate generated firmware against NXP format"""
         self.logger.info("Validating firmware format...")
         
@@ -237,19 +250,20 @@ class CorrectSJA1110Firmware:
             self.logger.error("UC firmware: Invalid IMAGE_VALID_MARKER")
             return False
             
-        if self.HEADER_EXEC not in uc_firmware[:100]:
+        exec_end = self.HEADER_EXEC_OFFSET + len(self.HEADER_EXEC)
+        if uc_firmware[self.HEADER_EXEC_OFFSET:exec_end] != self.HEADER_EXEC:
             self.logger.error("UC firmware: Missing HEADER_EXEC")
             return False
         
         # Check switch config
-        if not switch_config.startswith(self.IMAGE_VALID_MARKER):
+        if switch_config[:self.MARKER_LEN] != self.IMAGE_VALID_MARKER:
             self.logger.error("Switch config: Invalid IMAGE_VALID_MARKER")
             return False
         
         # Check device ID at correct position
-        device_id_offset = len(self.IMAGE_VALID_MARKER) + 56  # After marker + header
+        device_id_offset = self.MARKER_LEN + 56  # After marker + header
         if len(switch_config) > device_id_offset + 4:
-            device_id = struct.unpack('<I', switch_config[len(self.IMAGE_VALID_MARKER):len(self.IMAGE_VALID_MARKER)+4])[0]
+            device_id = _CONFIG_HEADER.unpack_from(switch_config, self.MARKER_LEN)[0]
             if device_id != self.SJA1110_DEVICE_ID:
                 self.logger.warning(f"Device ID mismatch: {device_id:08x} != {self.SJA1110_DEVICE_ID:08x}")
         
@@ -288,27 +302,47 @@ def create_corrected_firmware():
         name="P1_to_T1_Corrected"
     )
     
-    # Build firmware
-    print("Building corrected firmware...")
-    uc_firmware = builder.build_uc_firmware()
-    switch_config = builder.build_switch_config()
-    
-    # Validate
-    if not builder.validate_firmware(uc_firmware, switch_config):
-        print("❌ Validation failed!")
-        return None, None
-    
-    # Save files
     uc_file = "sja1110_uc_corrected.bin"
     switch_file = "sja1110_switch_corrected.bin"
     
-    with open(uc_file, 'wb') as f:
-        f.write(uc_firmware)
-    print(f"✓ Created {uc_file} ({len(uc_firmware):,} bytes)")
-    
-    with open(switch_file, 'wb') as f:
-        f.write(switch_config)
-    print(f"✓ Created {switch_file} ({len(switch_config):,} bytes)")
+    # Reuse the images from a previous run if the streams are unchanged
+    # and neither file has been rewritten since
+    key = build_key(__file__, builder.frer_streams)
+    if key_matches(uc_file, key) and key_matches(switch_file, key):
+        print("Streams unchanged, reusing existing firmware...")
+        with open(uc_file, 'rb') as f:
+            uc_firmware = f.read()
+        with open(switch_file, 'rb') as f:
+            switch_config = memoryview(f.read())
+        
+        if not builder.validate_firmware(uc_firmware, switch_config):
+            print("❌ Validation failed!")
+            return None, None
+        
+        print(f"✓ Kept {uc_file} ({len(uc_firmware):,} bytes)")
+        print(f"✓ Kept {switch_file} ({len(switch_config):,} bytes)")
+    else:
+        # Build firmware
+        print("Building corrected firmware...")
+        uc_firmware = builder.build_uc_firmware()
+        switch_config = builder.build_switch_config()
+        
+        # Validate
+        if not builder.validate_firmware(uc_firmware, switch_config):
+            print("❌ Validation failed!")
+            return None, None
+        
+        # Save files
+        with open(uc_file, 'wb') as f:
+            f.write(uc_firmware)
+        print(f"✓ Created {uc_file} ({len(uc_firmware):,} bytes)")
+        
+        with open(switch_file, 'wb') as f:
+            f.write(switch_config)
+        print(f"✓ Created {switch_file} ({len(switch_config):,} bytes)")
+        
+        for filename in (uc_file, switch_file):
+            write_key(filename, key)
     
     # Show hex dump comparison
     print("\n=== Corrected UC Firmware Header ===")
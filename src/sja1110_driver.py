@@ -13,12 +13,22 @@ try:
     import smbus2
 except ImportError:
     smbus2 = None
+import asyncio
 import struct
 import time
 import logging
+from contextlib import contextmanager
 from enum import IntEnum
 from typing import Optional, Union, List, Dict, Any
 
+from sja1110_common import spi_burst_words, spi_send
+
+# SPI frame header: [CMD:8][ADDR:24] as one big-endian word
+_SPI_HEADER = struct.Struct('>I')
+
+# Link speed names indexed by the PORT_STATUS speed bits
+_SPEEDS = ('10Mbps', '100Mbps', '1Gbps', '2.5Gbps')
+
 # SJA1110 Register Definitions
 class SJA1110Registers(IntEnum):
     # Device ID and Configuration
@@ -55,6 +65,10 @@ class SJA1110Registers(IntEnum):
 class SJA1110Driver:
     """Driver for NXP SJA1110 TSN Ethernet Switch"""
     
+    # SPI command byte, pre-shifted into the top of the [CMD][ADDR] header word
+    SPI_CMD_READ = 0x00 << 24
+    SPI_CMD_WRITE = 0x80 << 24
+    
     def __init__(self, interface: str = "spi", **kwargs):
         """
         Initialize SJA1110 driver
@@ -68,6 +82,11 @@ class SJA1110Driver:
         self.interface = interface.lower()
         self.logger = logging.getLogger(__name__)
         
+        # Pending (start address, [values]) runs while inside batched(),
+        # and the log messages for them, emitted once the runs are sent
+        self._batch: Optional[List[tuple]] = None
+        self._batch_logs: List[str] = []
+        
         if self.interface == "spi":
             self._init_spi(kwargs.get('bus', 0), 
                           kwargs.get('device', 0),
@@ -90,6 +109,9 @@ class SJA1110Driver:
             self.spi.max_speed_hz = max_speed
             self.spi.mode = 0b00  # SPI Mode 0
             self.spi.bits_per_word = 8
+            # Data words per burst: at most 64 per [CMD][ADDR] header, and
+            # never more than one spidev transfer
+            self.burst_words = spi_burst_words()
             self.logger.info(f"SPI initialized: bus={bus}, device={device}")
         except Exception as e:
             self.logger.error(f"Failed to initialize SPI: {e}")
@@ -129,6 +151,9 @@ class SJA1110Driver:
         Returns:
             Register value
         """
+        if self._batch:
+            self.flush()
+        
         if self.interface == "spi":
             return self._spi_read(address, length)
         else:
@@ -143,79 +168,184 @@ class SJA1110Driver:
             value: Value to write
             length: Number of bytes to write (default 4)
         """
+        if self._batch is not None and length == 4:
+            self._queue_write(address, value)
+            return
+        if self._batch:
+            self.flush()
+        
         if self.interface == "spi":
             self._spi_write(address, value, length)
         else:
             self._i2c_write(address, value, length)
     
+    def read_registers(self, address: int, count: int) -> List[int]:
+        """
+        Read consecutive 32-bit registers
+        
+        Over SPI the SJA1110 auto-increments the address, so each burst is
+        one [CMD][ADDR] header followed by count data words.
+        
+        Args:
+            address: Address of the first register
+            count: Number of registers to read
+        
+        Returns:
+            List of register values
+        """
+        if self._batch:
+            self.flush()
+        
+        if self.interface != "spi":
+            return [self._i2c_read(address + 4 * i, 4) for i in range(count)]
+        
+        values = []
+        for start in range(0, count, self.burst_words):
+            words = min(self.burst_words, count - start)
+            tx_data = bytearray(4 + 4 * words)
+            _SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_READ | ((address + 4 * start) & 0xFFFFFF))
+            rx_data = self.spi.xfer2(list(tx_data))
+            values.extend(struct.unpack(f'>{words}I', bytes(rx_data[4:4 + 4 * words])))
+        return values
+    
+    def write_registers(self, address: int, values: List[int]):
+        """
+        Write consecutive 32-bit registers
+        
+        Args:
+            address: Address of the first register
+            values: Register values, one per 32-bit word
+        """
+        if self._batch:
+            self.flush()
+        
+        if self.interface != "spi":
+            for i, value in enumerate(values):
+                self._i2c_write(address + 4 * i, value, 4)
+            return
+        
+        for start in range(0, len(values), self.burst_words):
+            words = values[start:start + self.burst_words]
+            tx_data = bytearray(4 + 4 * len(words))
+            _SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_WRITE | ((address + 4 * start) & 0xFFFFFF))
+            struct.pack_into(f'>{len(words)}I', tx_data, 4, *(w & 0xFFFFFFFF for w in words))
+            spi_send(self.spi, tx_data)
+    
+    @contextmanager
+    def batched(self):
+        """
+        Defer 32-bit register writes until the end of the block
+        
+        Queued writes keep their order; runs of consecutive addresses are
+        sent as one write_registers burst. Any read flushes the queue first,
+        so reads always see earlier writes. Nested blocks join the outer one.
+        The configure_* success messages are logged once their writes are
+        sent, and reset() sends everything queued before it settles.
+        
+        Example:
+            with driver.batched():
+                for vid in range(100, 110):
+                    driver.configure_vlan(vid, [0, 1])
+        """
+        if self._batch is not None:
+            yield self
+            return
+        
+        self._batch = []
+        try:
+            yield self
+        finally:
+            try:
+                self.flush()
+            finally:
+                self._batch = None
+                self._batch_logs.clear()
+    
+    def flush(self):
+        """Send writes queued by batched()"""
+        runs, self._batch = self._batch, ([] if self._batch is not None else None)
+        for address, values in runs or ():
+            self.write_registers(address, values)
+        
+        logs, self._batch_logs = self._batch_logs, []
+        for message in logs:
+            self.logger.info(message)
+    
+    def _log_applied(self, message: str):
+        """Log a configuration step, deferred while its writes are still queued"""
+        if self._batch is None:
+            self.logger.info(message)
+        else:
+            self._batch_logs.append(message)
+    
+    def _queue_write(self, address: int, value: int):
+        """Append a write to the batch, extending the last run if contiguous"""
+        if self._batch:
+            start, values = self._batch[-1]
+            if start + 4 * len(values) == address:
+                values.append(value)
+                return
+        self._batch.append((address, [value]))
+    
     def _spi_read(self, address: int, length: int) -> int:
         """SPI read operation"""
         # SJA1110 SPI protocol: [CMD][ADDR][DATA]
-        cmd = 0x00  # Read command
-        addr_bytes = [(address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
-        
-        tx_data = [cmd] + addr_bytes + [0x00] * length
-        rx_data = self.spi.xfer2(tx_data)
+        tx_data = bytearray(4 + length)
+        _SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_READ | (address & 0xFFFFFF))
+        rx_data = self.spi.xfer2(list(tx_data))
         
         # Extract data from response
-        value = 0
-        for i in range(length):
-            value = (value << 8) | rx_data[4 + i]
-        
-        return value
+        return int.from_bytes(bytes(rx_data[4:4 + length]), 'big')
     
     def _spi_write(self, address: int, value: int, length: int):
         """SPI write operation"""
         # SJA1110 SPI protocol: [CMD][ADDR][DATA]
-        cmd = 0x80  # Write command
-        addr_bytes = [(address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
-        
-        data_bytes = []
-        for i in range(length):
-            data_bytes.append((value >> (8 * (length - 1 - i))) & 0xFF)
-        
-        tx_data = [cmd] + addr_bytes + data_bytes
-        self.spi.xfer2(tx_data)
+        tx_data = bytearray(4 + length)
+        _SPI_HEADER.pack_into(tx_data, 0, self.SPI_CMD_WRITE | (address & 0xFFFFFF))
+        tx_data[4:] = (value & ((1 << (8 * length)) - 1)).to_bytes(length, 'big')
+        spi_send(self.spi, tx_data)
     
     def _i2c_read(self, address: int, length: int) -> int:
         """I2C read operation"""
-        # Send register address
-        addr_bytes = [(address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
+        # Register address, most significant byte first
+        addr_bytes = (address & 0xFFFFFF).to_bytes(3, 'big')
         
-        with smbus2.SMBus(self.i2c_bus.bus) as bus:
-            # Write register address
-            bus.write_i2c_block_data(self.i2c_address, addr_bytes[0], addr_bytes[1:])
-            
-            # Read data
-            data = bus.read_i2c_block_data(self.i2c_address, 0, length)
+        # Write register address on the bus opened in _init_i2c
+        self.i2c_bus.write_i2c_block_data(self.i2c_address, addr_bytes[0], list(addr_bytes[1:]))
         
-        # Convert to integer
-        value = 0
-        for byte in data:
-            value = (value << 8) | byte
+        # Read data
+        data = self.i2c_bus.read_i2c_block_data(self.i2c_address, 0, length)
         
-        return value
+        # Convert to integer
+        return int.from_bytes(bytes(data), 'big')
     
     def _i2c_write(self, address: int, value: int, length: int):
         """I2C write operation"""
         # Prepare address and data
-        addr_bytes = [(address >> 16) & 0xFF, (address >> 8) & 0xFF, address & 0xFF]
-        
-        data_bytes = []
-        for i in range(length):
-            data_bytes.append((value >> (8 * (length - 1 - i))) & 0xFF)
+        addr_bytes = (address & 0xFFFFFF).to_bytes(3, 'big')
+        data_bytes = (value & ((1 << (8 * length)) - 1)).to_bytes(length, 'big')
         
-        with smbus2.SMBus(self.i2c_bus.bus) as bus:
-            # Write register address and data
-            bus.write_i2c_block_data(self.i2c_address, addr_bytes[0], 
-                                    addr_bytes[1:] + data_bytes)
+        # Write register address and data
+        self.i2c_bus.write_i2c_block_data(self.i2c_address, addr_bytes[0],
+                                          list(addr_bytes[1:] + data_bytes))
     
-    def reset(self):
-        """Reset the switch"""
+    def reset(self, verify: bool = True):
+        """
+        Reset the switch
+        
+        Args:
+            verify: Read back the device ID once the reset has settled;
+                pass False to skip that SPI/I2C read when the caller goes
+                straight on to configuration writes
+        """
         self.logger.info("Resetting SJA1110...")
         self.write_register(SJA1110Registers.RESET_CTRL, 0x01)
+        # Inside batched() the write is only queued; it must go out before
+        # the settle time starts
+        self.flush()
         time.sleep(0.5)  # Wait for reset to complete
-        self._verify_device()
+        if verify:
+            self._verify_device()
     
     def get_port_status(self, port: int) -> Dict[str, Any]:
         """
@@ -233,6 +363,23 @@ class SJA1110Driver:
         status_reg = SJA1110Registers.PORT_STATUS_0 + (port * 4)
         status = self.read_register(status_reg)
         
+        return self._decode_port_status(port, status)
+    
+    def get_all_port_status(self) -> List[Dict[str, Any]]:
+        """
+        Get status of all ports (0-4)
+        
+        The five status registers are adjacent, so they are fetched with a
+        single burst read instead of one transfer per port.
+        
+        Returns:
+            List of port status dictionaries, indexed by port
+        """
+        words = self.read_registers(SJA1110Registers.PORT_STATUS_0, 5)
+        return [self._decode_port_status(port, status) for port, status in enumerate(words)]
+    
+    def _decode_port_status(self, port: int, status: int) -> Dict[str, Any]:
+        """Decode a PORT_STATUS register value"""
         return {
             'port': port,
             'link_up': bool(status & 0x01),
@@ -244,8 +391,9 @@ class SJA1110Driver:
     
     def _decode_speed(self, speed_bits: int) -> str:
         """Decode speed bits to string"""
-        speeds = {0: '10Mbps', 1: '100Mbps', 2: '1Gbps', 3: '2.5Gbps'}
-        return speeds.get(speed_bits, 'unknown')
+        if 0 <= speed_bits < len(_SPEEDS):
+            return _SPEEDS[speed_bits]
+        return 'unknown'
     
     def configure_vlan(self, vlan_id: int, ports: List[int], tagged: bool = True):
         """
@@ -273,7 +421,7 @@ class SJA1110Driver:
         table_offset = vlan_id * 4
         self.write_register(SJA1110Registers.VLAN_LOOKUP_TABLE + table_offset, entry)
         
-        self.logger.info(f"VLAN {vlan_id} configured: ports={ports}, tagged={tagged}")
+        self._log_applied(f"VLAN {vlan_id} configured: ports={ports}, tagged={tagged}")
     
     def configure_cbs(self, port: int, class_a_bw: int, class_b_bw: int):
         """
@@ -296,14 +444,16 @@ class SJA1110Driver:
         # CBS configuration register offset
         cbs_offset = port * 0x10
         
-        # Write Class A configuration
-        self.write_register(SJA1110Registers.CBS_CONFIG + cbs_offset, idle_slope_a)
-        
-        # Write Class B configuration
-        self.write_register(SJA1110Registers.CBS_CONFIG + cbs_offset + 4, idle_slope_b)
+        # Class A and B registers are adjacent, so they go out as one burst
+        with self.batched():
+            # Write Class A configuration
+            self.write_register(SJA1110Registers.CBS_CONFIG + cbs_offset, idle_slope_a)
+            
+            # Write Class B configuration
+            self.write_register(SJA1110Registers.CBS_CONFIG + cbs_offset + 4, idle_slope_b)
         
-        self.logger.info(f"CBS configured for port {port}: "
-                        f"Class A={class_a_bw}Mbps, Class B={class_b_bw}Mbps")
+        self._log_applied(f"CBS configured for port {port}: "
+                          f"Class A={class_a_bw}Mbps, Class B={class_b_bw}Mbps")
     
     def configure_tas(self, port: int, schedule: List[Dict[str, Any]]):
         """
@@ -319,8 +469,9 @@ class SJA1110Driver:
         # TAS base address for port
         tas_base = SJA1110Registers.TAS_CONFIG + (port * 0x1000)
         
-        # Write schedule entries
-        for i, entry in enumerate(schedule):
+        # Build schedule entries
+        tas_entries = []
+        for entry in schedule:
             gate_mask = entry.get('gate_mask', 0xFF)
             time_interval = entry.get('interval_ns', 1000000)  # Default 1ms
             
@@ -328,16 +479,17 @@ class SJA1110Driver:
             clock_cycles = time_interval // 8
             
             # TAS entry format: [GATE_MASK][INTERVAL]
-            tas_entry = (gate_mask << 24) | (clock_cycles & 0xFFFFFF)
-            
-            # Write entry to schedule table
-            self.write_register(tas_base + (i * 4), tas_entry)
+            tas_entries.append((gate_mask << 24) | (clock_cycles & 0xFFFFFF))
+        
+        # Write the whole schedule table in one burst
+        if tas_entries:
+            self.write_registers(tas_base, tas_entries)
         
         # Enable TAS for port
         ctrl_reg = tas_base + 0x100
         self.write_register(ctrl_reg, 0x01)  # Enable TAS
         
-        self.logger.info(f"TAS configured for port {port}: {len(schedule)} entries")
+        self._log_applied(f"TAS configured for port {port}: {len(schedule)} entries")
     
     def enable_ptp(self, port: int = -1):
         """
@@ -361,7 +513,7 @@ class SJA1110Driver:
         clock_cfg = 0x01  # Enable PTP clock
         self.write_register(SJA1110Registers.PTP_CONFIG + 0x10, clock_cfg)
         
-        self.logger.info(f"PTP enabled on {'all ports' if port == -1 else f'port {port}'}")
+        self._log_applied(f"PTP enabled on {'all ports' if port == -1 else f'port {port}'}")
     
     def get_statistics(self, port: int) -> Dict[str, int]:
         """
@@ -378,15 +530,18 @@ class SJA1110Driver:
         
         stats_base = SJA1110Registers.STATS_PORT_0 + (port * 0x10000)
         
+        # Counters occupy 0x00-0x27; read them in one burst
+        words = self.read_registers(stats_base, 10)
+        
         stats = {
-            'rx_packets': self.read_register(stats_base + 0x00),
-            'tx_packets': self.read_register(stats_base + 0x04),
-            'rx_bytes': self.read_register(stats_base + 0x08, 8),
-            'tx_bytes': self.read_register(stats_base + 0x10, 8),
-            'rx_errors': self.read_register(stats_base + 0x18),
-            'tx_errors': self.read_register(stats_base + 0x1C),
-            'rx_dropped': self.read_register(stats_base + 0x20),
-            'tx_dropped': self.read_register(stats_base + 0x24),
+            'rx_packets': words[0],
+            'tx_packets': words[1],
+            'rx_bytes': (words[2] << 32) | words[3],
+            'tx_bytes': (words[4] << 32) | words[5],
+            'rx_errors': words[6],
+            'tx_errors': words[7],
+            'rx_dropped': words[8],
+            'tx_dropped': words[9],
         }
         
         return stats
@@ -400,6 +555,81 @@ class SJA1110Driver:
         self.logger.info("Driver closed")
 
 
+class AsyncSJA1110Driver:
+    """
+    asyncio front end for SJA1110Driver
+    
+    Blocking bus transfers run in a worker thread (asyncio.to_thread), so
+    several switches can be configured concurrently with asyncio.gather().
+    Calls on one instance are serialized because the bus carries one
+    transfer at a time.
+    
+    Example:
+        drivers = await asyncio.gather(
+            AsyncSJA1110Driver.open("spi", bus=0, device=0),
+            AsyncSJA1110Driver.open("spi", bus=1, device=0))
+        await asyncio.gather(*(d.enable_ptp() for d in drivers))
+    """
+    
+    def __init__(self, driver: SJA1110Driver):
+        self.driver = driver
+        self._lock = asyncio.Lock()
+    
+    @classmethod
+    async def open(cls, interface: str = "spi", **kwargs) -> "AsyncSJA1110Driver":
+        """Open and probe an SJA1110Driver without blocking the event loop"""
+        return cls(await asyncio.to_thread(SJA1110Driver, interface, **kwargs))
+    
+    async def _call(self, func, *args, **kwargs):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args, **kwargs)
+    
+    async def read_register(self, address: int, length: int = 4) -> int:
+        return await self._call(self.driver.read_register, address, length)
+    
+    async def write_register(self, address: int, value: int, length: int = 4):
+        await self._call(self.driver.write_register, address, value, length)
+    
+    async def read_registers(self, address: int, count: int) -> List[int]:
+        return await self._call(self.driver.read_registers, address, count)
+    
+    async def write_registers(self, address: int, values: List[int]):
+        await self._call(self.driver.write_registers, address, values)
+    
+    async def reset(self, verify: bool = True):
+        """Reset the switch, awaiting the settle time instead of sleeping"""
+        self.driver.logger.info("Resetting SJA1110...")
+        await self.write_register(SJA1110Registers.RESET_CTRL, 0x01)
+        await self._call(self.driver.flush)
+        await asyncio.sleep(0.5)  # Wait for reset to complete
+        if verify:
+            await self._call(self.driver._verify_device)
+    
+    async def get_port_status(self, port: int) -> Dict[str, Any]:
+        return await self._call(self.driver.get_port_status, port)
+    
+    async def get_all_port_status(self) -> List[Dict[str, Any]]:
+        return await self._call(self.driver.get_all_port_status)
+    
+    async def configure_vlan(self, vlan_id: int, ports: List[int], tagged: bool = True):
+        await self._call(self.driver.configure_vlan, vlan_id, ports, tagged)
+    
+    async def configure_cbs(self, port: int, class_a_bw: int, class_b_bw: int):
+        await self._call(self.driver.configure_cbs, port, class_a_bw, class_b_bw)
+    
+    async def configure_tas(self, port: int, schedule: List[Dict[str, Any]]):
+        await self._call(self.driver.configure_tas, port, schedule)
+    
+    async def enable_ptp(self, port: int = -1):
+        await self._call(self.driver.enable_ptp, port)
+    
+    async def get_statistics(self, port: int) -> Dict[str, int]:
+        return await self._call(self.driver.get_statistics, port)
+    
+    async def close(self):
+        await self._call(self.driver.close)
+
+
 if __name__ == "__main__":
     # Example usage
     logging.basicConfig(level=logging.INFO)
@@ -408,17 +638,17 @@ if __name__ == "__main__":
     driver = SJA1110Driver(interface="spi", bus=0, device=0)
     
     # Get port status
-    for port in range(5):
-        status = driver.get_port_status(port)
+    for port, status in enumerate(driver.get_all_port_status()):
         print(f"Port {port}: {status}")
     
-    # Configure VLAN
-    driver.configure_vlan(vlan_id=100, ports=[0, 1, 2], tagged=True)
-    
-    # Configure CBS for TSN
-    driver.configure_cbs(port=0, class_a_bw=75, class_b_bw=75)
-    
-    # Enable PTP
-    driver.enable_ptp()
+    with driver.batched():
+        # Configure VLAN
+        driver.configure_vlan(vlan_id=100, ports=[0, 1, 2], tagged=True)
+        
+        # Configure CBS for TSN
+        driver.configure_cbs(port=0, class_a_bw=75, class_b_bw=75)
+        
+        # Enable PTP
+        driver.enable_ptp()
     
     driver.close()
\ No newline at end of file
@@ -15,17 +15,89 @@ from __future__ import annotations
 import json
 import logging
 import struct
-import zlib
 from dataclasses import dataclass, field
 from datetime import datetime
+from functools import lru_cache
+from itertools import chain, repeat
 from typing import Dict, List, Optional
 
+from sja1110_common import crc32
+
 IMAGE_VALID_MARKER = bytes([0x6A, 0xA6] * 4)
 DEVICE_ID_SJA1110 = 0xB700030E
 CONFIG_FLAGS = (1 << 31) | (1 << 30) | (1 << 29) | (1 << 28)
 UC_IMAGE_SIZE = 256 * 1024
 SWITCH_IMAGE_SIZE = 640 * 1024
 
+# 16-byte CB sequence generation entry: stream, port mask, flags, replica
+# count, sequence number, up to four egress ports (zero padded), source
+# port and priority.
+_CB_SEQ_ENTRY = struct.Struct("<HHBBH4sBB2x")
+# 12-byte CB individual recovery entry: stream, source port, flags, sequence
+# number, history length, reset timeout and replica count.
+_CB_REC_ENTRY = struct.Struct("<HBBHHHH")
+# 10-byte DPI entry: stream, VLAN, R-TAG ethertype, enable, valid, priority
+# and source port.
+_DPI_ENTRY = struct.Struct("<HHHBBBB")
+# Image headers (valid marker + device ID [+ config flags]), the general
+# parameters block (FRMREPEN, host/cascade port) and the CRC32 trailer.
+_UC_HEADER = struct.Struct("<8sI")
+_SWITCH_HEADER = struct.Struct("<8sII")
+_GENERAL_PARAMS = struct.Struct("<IBB2x")
+_CRC32 = struct.Struct("<I")
+
+# FRER table offsets inside the switch image.
+CB_SEQ_TABLE_OFFSET = 0x080000
+CB_REC_TABLE_OFFSET = 0x090000
+DPI_TABLE_OFFSET = 0x0A0000
+
+
+@lru_cache(maxsize=None)
+def _tables_layout(count: int):
+    """Return a Struct covering all three FRER tables and their end offset.
+
+    The layout only depends on the stream count, so it is compiled once per
+    count.  A table that outgrows its slot pushes the following ones back
+    instead of overlapping them; the gaps between tables are ``x`` pad
+    bytes, which pack as zeros.
+    """
+
+    cb_seq_end = CB_SEQ_TABLE_OFFSET + count * _CB_SEQ_ENTRY.size
+    cb_rec_offset = max(CB_REC_TABLE_OFFSET, cb_seq_end)
+    cb_rec_end = cb_rec_offset + count * _CB_REC_ENTRY.size
+    dpi_offset = max(DPI_TABLE_OFFSET, cb_rec_end)
+    dpi_end = dpi_offset + count * _DPI_ENTRY.size
+
+    # '<' disables alignment, so repeating the field codes gives exactly
+    # count consecutive entries.
+    tables = struct.Struct(
+        "<"
+        + _CB_SEQ_ENTRY.format[1:] * count
+        + f"{cb_rec_offset - cb_seq_end}x"
+        + _CB_REC_ENTRY.format[1:] * count
+        + f"{dpi_offset - cb_rec_end}x"
+        + _DPI_ENTRY.format[1:] * count
+    )
+    return tables, dpi_end
+
+
+@lru_cache(maxsize=4)
+def _switch_prefix(host_port: int, cascade_port: int):
+    """Return the switch image ahead of the FRER tables and its CRC-32.
+
+    That region only holds the header and the general parameters block,
+    so it is the same for every build with the same host/cascade ports.
+    Caching it lets each build skip re-reading 512 KiB for the CRC and
+    resume the checksum at the tables instead.
+    """
+
+    prefix = bytearray(CB_SEQ_TABLE_OFFSET)
+    _SWITCH_HEADER.pack_into(prefix, 0, IMAGE_VALID_MARKER, DEVICE_ID_SJA1110, CONFIG_FLAGS)
+
+    # General parameters block at 0x034000 – FRER enable + host/cascade port.
+    _GENERAL_PARAMS.pack_into(prefix, 0x034000, 1, host_port, cascade_port)
+    return bytes(prefix), crc32(prefix)
+
 
 @dataclass
 class FRERStream:
@@ -39,11 +111,42 @@ class FRERStream:
     name: str = ""
     sequence_history: int = 32
     enabled: bool = True
+    # Table encodings of dst_ports, cached until dst_ports changes so that
+    # repeated switch image builds only have to gather them.
+    _encoded_ports: Optional[tuple] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def _encode_ports(self) -> tuple:
+        ports = tuple(self.dst_ports)
+        if self._encoded_ports is None or self._encoded_ports[0] != ports:
+            self._encoded_ports = (
+                ports,
+                sum(1 << port for port in set(ports)),
+                bytes(port & 0xFF for port in ports[:4]),
+            )
+        return self._encoded_ports
+
+    @property
+    def port_mask(self) -> int:
+        """Bit mask of the destination ports."""
+        return self._encode_ports()[1]
+
+    @property
+    def egress_ports(self) -> bytes:
+        """First four destination ports, one byte each."""
+        return self._encode_ports()[2]
 
 
 class SJA1110FirmwareBuilder:
     """Light‑weight firmware builder for NXP Gold Box deployments."""
 
+    # Erased (0xFF) UC image with its fixed header already in place; each
+    # build starts from a copy of it.
+    _UC_TEMPLATE = _UC_HEADER.pack(IMAGE_VALID_MARKER, DEVICE_ID_SJA1110) + b"\xFF" * (
+        UC_IMAGE_SIZE - _UC_HEADER.size
+    )
+
     def __init__(self, host_port: int = 4, cascade_port: int = 10) -> None:
         self.host_port = host_port
         self.cascade_port = cascade_port
@@ -93,14 +196,19 @@ class SJA1110FirmwareBuilder:
             priority,
         )
 
-    def build_microcontroller_firmware(self) -> bytes:
-        """Return a minimal UC firmware image with valid header + CRC32."""
+    def build_microcontroller_firmware(self) -> memoryview:
+        """Return a minimal UC firmware image with valid header + CRC32.
+
+        The image is returned as a zero-copy view of the build buffer.
+        """
 
-        payload = bytearray()
-        payload.extend(IMAGE_VALID_MARKER)
-        payload.extend(struct.pack("<I", DEVICE_ID_SJA1110))
+        # Copy the whole image, header included and already filled with
+        # 0xFF, then write the manifest at its fixed offset.
+        payload = bytearray(self._UC_TEMPLATE)
 
         # Embed a lightweight manifest describing the configured streams.
+        # Only its first 96 bytes are kept, and the timestamp plus a single
+        # stream entry already fill those, so later streams are not encoded.
         manifest = json.dumps(
             {
                 "generated": datetime.now().isoformat(),
@@ -112,99 +220,91 @@ class SJA1110FirmwareBuilder:
                         "vlan": s.vlan_id,
                         "priority": s.priority,
                     }
-                    for s in self.streams
+                    for s in self.streams[:2]
                 ],
             }
         ).encode("utf-8")
 
         manifest = manifest[:96]  # keep header compact
-        payload.extend(manifest)
-        payload.extend(b"\x00" * (96 - len(manifest)))
-
-        # Fill remaining area with 0xFF to match expected size (minus CRC).
-        while len(payload) < (UC_IMAGE_SIZE - 4):
-            payload.append(0xFF)
-
-        crc = zlib.crc32(payload) & 0xFFFFFFFF
-        payload.extend(struct.pack("<I", crc))
-        return bytes(payload)
-
-    def build_switch_firmware(self) -> bytes:
-        """Create switch configuration container with correct CRC32."""
-
-        config = bytearray()
-        config.extend(IMAGE_VALID_MARKER)
-        config.extend(struct.pack("<I", DEVICE_ID_SJA1110))
-        config.extend(struct.pack("<I", CONFIG_FLAGS))
-
-        # General parameters block at 0x034000 – FRER enable + host/cascade port.
-        while len(config) < 0x034000:
-            config.append(0x00)
-
-        config.extend(struct.pack("<I", 1))  # FRMREPEN
-        config.extend(struct.pack("<BB", self.host_port, self.cascade_port))
-        config.extend(b"\x00\x00")  # padding
-
-        # Simplified CB sequence table starting at 0x080000.
-        while len(config) < 0x080000:
-            config.append(0x00)
-
-        for stream in self.streams:
-            entry = bytearray(16)
-            port_mask = 0
-            for port in stream.dst_ports:
-                port_mask |= (1 << port)
-            struct.pack_into("<HH", entry, 0, stream.stream_id, port_mask)
-            entry[4] = 0x80 if stream.enabled else 0x00
-            entry[5] = min(len(stream.dst_ports), 4)  # number of replicas (metadata)
-            struct.pack_into("<H", entry, 6, 0)  # sequence number placeholder
-            for idx, port in enumerate(stream.dst_ports[:4]):
-                entry[8 + idx] = port & 0xFF
-            entry[12] = stream.src_port & 0xFF
-            entry[13] = stream.priority & 0xFF
-            config.extend(entry)
-
-        # CB individual recovery table at 0x090000.
-        while len(config) < 0x090000:
-            config.append(0x00)
-
-        for stream in self.streams:
-            entry = struct.pack(
-                "<HBBHHHH",
-                stream.stream_id,
-                stream.src_port,
-                0x80 if stream.enabled else 0x00,
-                0,
-                stream.sequence_history,
-                100,
-                len(stream.dst_ports),
-            )
-            config.extend(entry)
-
-        # DPI table at 0x0A0000.
-        while len(config) < 0x0A0000:
-            config.append(0x00)
-
-        for stream in self.streams:
-            entry = struct.pack(
-                "<HHHBBBB",
-                stream.stream_id,
-                stream.vlan_id & 0x0FFF,
-                0xF1C1,
-                1 if stream.enabled else 0,
-                1,
-                stream.priority & 0xFF,
-                stream.src_port & 0xFF,
-            )
-            config.extend(entry)
+        payload[_UC_HEADER.size:_UC_HEADER.size + 96] = manifest.ljust(96, b"\x00")
+
+        # The rest is already 0xFF up to the CRC trailer.
+        crc_offset = UC_IMAGE_SIZE - _CRC32.size
+        with memoryview(payload) as view:
+            crc = crc32(view[:crc_offset]) & 0xFFFFFFFF
+        _CRC32.pack_into(payload, crc_offset, crc)
+        return memoryview(payload)
+
+    def build_switch_firmware(self) -> memoryview:
+        """Create switch configuration container with correct CRC32.
+
+        The image is returned as a zero-copy view of the build buffer.
+        """
+
+        tables, end = _tables_layout(len(self.streams))
+        size = max(SWITCH_IMAGE_SIZE, end)
+
+        # Header and general parameters come from the cached prefix.
+        prefix, prefix_crc = _switch_prefix(self.host_port, self.cascade_port)
+        config = bytearray(size + _CRC32.size)
+        config[:CB_SEQ_TABLE_OFFSET] = prefix
+
+        # Pull each field out of the streams once; the three FRER tables are
+        # then emitted column-wise with a single pack_into().
+        streams = self.streams
+        ids = [s.stream_id for s in streams]
+        flags = [0x80 if s.enabled else 0x00 for s in streams]
+        src_ports = [s.src_port & 0xFF for s in streams]
+        priorities = [s.priority & 0xFF for s in streams]
+        replicas = [len(s.dst_ports) for s in streams]
+        port_masks = [s.port_mask for s in streams]
+
+        tables.pack_into(config, CB_SEQ_TABLE_OFFSET, *chain(
+            # CB sequence table (replication): stream, port mask, flags,
+            # number of replicas (metadata), sequence number placeholder,
+            # first four egress ports, source port, priority
+            chain.from_iterable(zip(
+                ids,
+                port_masks,
+                flags,
+                (min(count, 4) for count in replicas),
+                repeat(0),
+                (s.egress_ports for s in streams),
+                src_ports,
+                priorities,
+            )),
+            # CB individual recovery table (elimination): stream, source
+            # port, flags, sequence number, history length, reset timeout,
+            # replica count
+            chain.from_iterable(zip(
+                ids,
+                (s.src_port for s in streams),
+                flags,
+                repeat(0),
+                (s.sequence_history for s in streams),
+                repeat(100),
+                replicas,
+            )),
+            # DPI table (stream identification): stream, VLAN, R-TAG
+            # ethertype, enable, valid, priority, source port
+            chain.from_iterable(zip(
+                ids,
+                (s.vlan_id & 0x0FFF for s in streams),
+                repeat(0xF1C1),
+                (1 if s.enabled else 0 for s in streams),
+                repeat(1),
+                priorities,
+                src_ports,
+            )),
+        ))
 
         # Pad to expected payload size and append CRC.
-        while len(config) < SWITCH_IMAGE_SIZE:
-            config.append(0xFF)
+        config[end:size] = b"\xFF" * (size - end)
 
-        crc = zlib.crc32(config) & 0xFFFFFFFF
-        config.extend(struct.pack("<I", crc))
-        return bytes(config)
+        with memoryview(config) as view:
+            crc = crc32(view[CB_SEQ_TABLE_OFFSET:size], prefix_crc) & 0xFFFFFFFF
+        _CRC32.pack_into(config, size, crc)
+        return memoryview(config)
 
     # ------------------------------------------------------------------
     # Utility helpers
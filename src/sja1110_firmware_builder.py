@@ -6,7 +6,6 @@ Generates firmware binaries for NXP Gold Box
 
 import struct
 import json
-import hashlib
 import argparse
 import logging
 from pathlib import Path
@@ -14,6 +13,34 @@ from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
+from sja1110_common import crc32
+
+# 64-byte firmware header: magic, version, header size, payload size,
+# checksum, timestamp, config offset/size, reserved
+_HEADER = struct.Struct('>IHHHHIIIII32x')
+assert _HEADER.size == 64
+# The checksum field is hashed as zero
+_CHECKSUM_OFFSET = 16
+_CHECKSUM = struct.Struct('>I')
+# Configuration section header: section ID, data length
+_SECTION_HEADER = struct.Struct('>II')
+# 32-byte general config section: switch mode, feature bits, MAC address
+_GENERAL_CONFIG = struct.Struct('>II6s18x')
+# Entry count leading the port and VLAN sections
+_COUNT = struct.Struct('>H')
+# 16-byte port entry: ID/enable/autoneg/duplex word, speed, PVID
+_PORT_ENTRY = struct.Struct('>IIH6x')
+# 20-byte VLAN entry: VLAN ID, port membership bitmap, zero padded name
+_VLAN_ENTRY = struct.Struct('>HH16s')
+# TSN section: feature bits, per-class CBS parameters, TAS cycle time and
+# gate control list length, then gate mask + interval per GCL entry
+_FEATURES = struct.Struct('>I')
+_CBS_ENTRY = struct.Struct('>IIII')
+_TAS_HEADER = struct.Struct('>QH')
+_GCL_ENTRY = struct.Struct('>BQ')
+# 16-byte PTP section: mode, profile, priority1, priority2, domain
+_PTP_CONFIG = struct.Struct('>IIBBB5x')
+
 @dataclass
 class FirmwareHeader:
     """SJA1110 Firmware Header Structure"""
@@ -21,7 +48,7 @@ class FirmwareHeader:
     version_major: int = 1
     version_minor: int = 0
     version_patch: int = 0
-    header_size: int = 64
+    header_size: int = _HEADER.size
     payload_size: int = 0
     checksum: int = 0
     timestamp: int = 0
@@ -30,17 +57,16 @@ class FirmwareHeader:
     
     def to_bytes(self) -> bytes:
         """Convert header to binary format"""
-        return struct.pack('>IHHHHIIIII',
-                          self.magic,
-                          self.version_major,
-                          self.version_minor,
-                          self.version_patch,
-                          self.header_size,
-                          self.payload_size,
-                          self.checksum,
-                          self.timestamp,
-                          self.config_offset,
-                          self.config_size)
+        return _HEADER.pack(self.magic,
+                            self.version_major,
+                            self.version_minor,
+                            self.version_patch,
+                            self.header_size,
+                            self.payload_size,
+                            self.checksum,
+                            self.timestamp,
+                            self.config_offset,
+                            self.config_size)
 
 class SJA1110FirmwareBuilder:
     """Build firmware binaries for SJA1110"""
@@ -66,11 +92,8 @@ class SJA1110FirmwareBuilder:
     
     def add_general_config(self, config: Dict[str, Any]):
         """Add general switch configuration"""
-        data = bytearray()
-        
         # Switch mode (0=Unmanaged, 1=Managed)
         mode = 1 if config.get('managed', True) else 0
-        data.extend(struct.pack('>I', mode))
         
         # Enable features
         features = 0
@@ -85,26 +108,22 @@ class SJA1110FirmwareBuilder:
         if config.get('ptp_enable', True):
             features |= 0x10
         
-        data.extend(struct.pack('>I', features))
-        
-        # MAC address
+        # MAC address; '6s' would silently pad or truncate, so check it
         mac = config.get('mac_address', '00:00:00:00:00:00')
         mac_bytes = bytes.fromhex(mac.replace(':', ''))
-        data.extend(mac_bytes)
-        
-        # Padding
-        data.extend(b'\x00' * (32 - len(data)))
+        if len(mac_bytes) != 6:
+            raise ValueError(f"Invalid MAC address: {mac}")
         
-        self.config_sections[self.GENERAL_CONFIG] = bytes(data)
+        self.config_sections[self.GENERAL_CONFIG] = _GENERAL_CONFIG.pack(mode, features, mac_bytes)
         self.logger.info(f"Added general config: mode={mode}, features=0x{features:02X}")
     
     def add_port_config(self, ports: List[Dict[str, Any]]):
         """Add port configuration"""
-        data = bytearray()
-        
-        # Number of ports
-        data.extend(struct.pack('>H', len(ports)))
+        # Number of ports, then one 16-byte entry per port
+        data = bytearray(_COUNT.size + _PORT_ENTRY.size * len(ports))
+        _COUNT.pack_into(data, 0, len(ports))
         
+        offset = _COUNT.size
         for port in ports:
             port_id = port.get('id', 0)
             enabled = 1 if port.get('enabled', True) else 0
@@ -114,52 +133,42 @@ class SJA1110FirmwareBuilder:
             
             # Port configuration entry
             port_cfg = (port_id << 24) | (enabled << 16) | (auto_neg << 8) | duplex
-            data.extend(struct.pack('>I', port_cfg))
-            data.extend(struct.pack('>I', speed))
             
             # VLAN configuration for port
             pvid = port.get('pvid', 1)
-            data.extend(struct.pack('>H', pvid))
             
-            # Padding
-            data.extend(b'\x00' * 6)
+            _PORT_ENTRY.pack_into(data, offset, port_cfg, speed, pvid)
+            offset += _PORT_ENTRY.size
         
         self.config_sections[self.PORT_CONFIG] = bytes(data)
         self.logger.info(f"Added port config for {len(ports)} ports")
     
     def add_vlan_config(self, vlans: List[Dict[str, Any]]):
         """Add VLAN configuration"""
-        data = bytearray()
-        
-        # Number of VLANs
-        data.extend(struct.pack('>H', len(vlans)))
+        # Number of VLANs, then one 20-byte entry per VLAN
+        data = bytearray(_COUNT.size + _VLAN_ENTRY.size * len(vlans))
+        _COUNT.pack_into(data, 0, len(vlans))
         
+        offset = _COUNT.size
         for vlan in vlans:
             vlan_id = vlan.get('id', 1)
-            name = vlan.get('name', f'VLAN{vlan_id}')[:16]
+            # Only format the default name when there is none; 16 characters
+            # always cover the 16 bytes '16s' keeps
+            name = vlan['name'] if 'name' in vlan else f'VLAN{vlan_id}'
             ports = vlan.get('ports', [])
             
-            # VLAN entry
-            data.extend(struct.pack('>H', vlan_id))
-            
             # Port membership bitmap
-            port_mask = 0
-            for port in ports:
-                port_mask |= (1 << port)
-            data.extend(struct.pack('>H', port_mask))
+            port_mask = sum(1 << port for port in set(ports))
             
-            # VLAN name (16 bytes)
-            name_bytes = name.encode('utf-8')[:16]
-            data.extend(name_bytes)
-            data.extend(b'\x00' * (16 - len(name_bytes)))
+            # VLAN entry; the name is truncated/zero padded to 16 bytes
+            _VLAN_ENTRY.pack_into(data, offset, vlan_id, port_mask, name[:16].encode('utf-8'))
+            offset += _VLAN_ENTRY.size
         
         self.config_sections[self.VLAN_CONFIG] = bytes(data)
         self.logger.info(f"Added VLAN config for {len(vlans)} VLANs")
     
     def add_tsn_config(self, tsn: Dict[str, Any]):
         """Add TSN configuration"""
-        data = bytearray()
-        
         # TSN features
         features = 0
         if tsn.get('cbs_enable', False):
@@ -169,7 +178,18 @@ class SJA1110FirmwareBuilder:
         if tsn.get('preemption_enable', False):
             features |= 0x04
         
-        data.extend(struct.pack('>I', features))
+        gcl = tsn.get('tas', {}).get('gate_control_list', []) if tsn.get('tas_enable', False) else []
+        
+        # Size the section up front: features, CBS block, TAS block
+        size = _FEATURES.size
+        if tsn.get('cbs_enable', False):
+            size += 8 * _CBS_ENTRY.size
+        if tsn.get('tas_enable', False):
+            size += _TAS_HEADER.size + _GCL_ENTRY.size * len(gcl)
+        data = bytearray(size)
+        
+        _FEATURES.pack_into(data, 0, features)
+        offset = _FEATURES.size
         
         # CBS configuration
         if tsn.get('cbs_enable', False):
@@ -180,24 +200,25 @@ class SJA1110FirmwareBuilder:
                 hi_credit = cbs.get(f'tc{tc}_hi_credit', 0)
                 lo_credit = cbs.get(f'tc{tc}_lo_credit', 0)
                 
-                data.extend(struct.pack('>IIII', 
-                                       idle_slope, send_slope, 
-                                       hi_credit, lo_credit))
+                _CBS_ENTRY.pack_into(data, offset,
+                                     idle_slope, send_slope,
+                                     hi_credit, lo_credit)
+                offset += _CBS_ENTRY.size
         
         # TAS configuration
         if tsn.get('tas_enable', False):
             tas = tsn.get('tas', {})
             cycle_time = tas.get('cycle_time_ns', 1000000)  # 1ms default
-            data.extend(struct.pack('>Q', cycle_time))
             
-            # Gate control list
-            gcl = tas.get('gate_control_list', [])
-            data.extend(struct.pack('>H', len(gcl)))
+            # Cycle time and gate control list length
+            _TAS_HEADER.pack_into(data, offset, cycle_time, len(gcl))
+            offset += _TAS_HEADER.size
             
             for entry in gcl:
                 gate_mask = entry.get('gate_mask', 0xFF)
                 time_interval = entry.get('time_interval_ns', 125000)
-                data.extend(struct.pack('>BQ', gate_mask, time_interval))
+                _GCL_ENTRY.pack_into(data, offset, gate_mask, time_interval)
+                offset += _GCL_ENTRY.size
         
         self.config_sections[self.TSN_CONFIG] = bytes(data)
         self.logger.info(f"Added TSN config: features=0x{features:02X}")
@@ -209,63 +230,63 @@ class SJA1110FirmwareBuilder:
     
     def add_ptp_config(self, ptp: Dict[str, Any]):
         """Add PTP configuration"""
-        data = bytearray()
-        
         # PTP mode (0=Disabled, 1=OrdinaryClock, 2=BoundaryClock, 3=TransparentClock)
         mode = ptp.get('mode', 2)  # Default BoundaryClock
-        data.extend(struct.pack('>I', mode))
         
         # PTP profile (0=Default, 1=Automotive, 2=Industrial)
         profile = ptp.get('profile', 1)  # Default Automotive
-        data.extend(struct.pack('>I', profile))
         
         # Clock parameters
         priority1 = ptp.get('priority1', 128)
         priority2 = ptp.get('priority2', 128)
         domain = ptp.get('domain', 0)
         
-        data.extend(struct.pack('>BBB', priority1, priority2, domain))
-        
-        # Padding
-        data.extend(b'\x00' * 5)
-        
-        self.config_sections[self.PTP_CONFIG] = bytes(data)
+        self.config_sections[self.PTP_CONFIG] = _PTP_CONFIG.pack(
+            mode, profile, priority1, priority2, domain)
         self.logger.info(f"Added PTP config: mode={mode}, profile={profile}")
     
     def build_firmware(self, output_file: str) -> str:
         """Build complete firmware binary"""
-        # Create payload
-        payload = bytearray()
+        # Lay out the sections first so header and payload can share one
+        # preallocated, zero-filled buffer
+        section_ids = sorted(self.config_sections.keys())
+        payload_size = 0
+        for section_id in section_ids:
+            # Section header + data, aligned to a 16-byte boundary
+            payload_size += (_SECTION_HEADER.size + len(self.config_sections[section_id]) + 15) & ~15
+        
+        firmware = bytearray(_HEADER.size + payload_size)
         config_offsets = {}
         
         # Add configuration sections
-        for section_id in sorted(self.config_sections.keys()):
-            config_offsets[section_id] = len(payload)
+        offset = _HEADER.size
+        for section_id in section_ids:
+            config_offsets[section_id] = offset - _HEADER.size
             section_data = self.config_sections[section_id]
             
             # Section header
-            payload.extend(struct.pack('>II', section_id, len(section_data)))
-            payload.extend(section_data)
+            _SECTION_HEADER.pack_into(firmware, offset, section_id, len(section_data))
+            data_offset = offset + _SECTION_HEADER.size
+            firmware[data_offset:data_offset + len(section_data)] = section_data
             
-            # Align to 16-byte boundary
-            padding = (16 - (len(payload) % 16)) % 16
-            payload.extend(b'\x00' * padding)
+            # Padding to the 16-byte boundary is already zero
+            offset += (_SECTION_HEADER.size + len(section_data) + 15) & ~15
         
         # Create header
         header = FirmwareHeader()
         header.timestamp = int(datetime.now().timestamp())
-        header.payload_size = len(payload)
-        header.config_offset = 64  # After header
-        header.config_size = len(payload)
+        header.payload_size = payload_size
+        header.config_offset = _HEADER.size  # After header
+        header.config_size = payload_size
         
-        # Calculate checksum
-        checksum_data = header.to_bytes() + bytes(payload)
-        header.checksum = struct.unpack('>I', hashlib.sha256(checksum_data).digest()[:4])[0]
+        # Calculate checksum over the whole image with the checksum field 0
+        firmware[:_HEADER.size] = header.to_bytes()
+        header.checksum = crc32(firmware) & 0xFFFFFFFF
+        _CHECKSUM.pack_into(firmware, _CHECKSUM_OFFSET, header.checksum)
         
         # Write firmware file
         with open(output_file, 'wb') as f:
-            f.write(header.to_bytes())
-            f.write(bytes(payload))
+            f.write(firmware)
         
         # Write metadata
         meta_file = output_file.replace('.bin', '_meta.json')
@@ -287,11 +308,11 @@ class SJA1110FirmwareBuilder:
         try:
             with open(firmware_file, 'rb') as f:
                 # Read header
-                header_data = f.read(64)
-                if len(header_data) < 64:
+                header_data = f.read(_HEADER.size)
+                if len(header_data) < _HEADER.size:
                     self.logger.error(f"Header too short: {len(header_data)} bytes")
                     return False
-                header = struct.unpack('>IHHHHIIIII', header_data[:32])
+                header = _HEADER.unpack(header_data)
                 
                 magic = header[0]
                 payload_size = header[5]
@@ -305,9 +326,12 @@ class SJA1110FirmwareBuilder:
                 # Read payload
                 payload = f.read(payload_size)
                 
-                # Calculate checksum
-                checksum_data = header_data[:24] + b'\x00\x00\x00\x00' + header_data[28:] + payload
-                calculated_checksum = struct.unpack('>I', hashlib.sha256(checksum_data).digest()[:4])[0]
+                # Calculate checksum, with the stored checksum field as zero
+                view = memoryview(header_data)
+                crc = crc32(view[:_CHECKSUM_OFFSET])
+                crc = crc32(b'\x00\x00\x00\x00', crc)
+                crc = crc32(view[_CHECKSUM_OFFSET + 4:], crc)
+                calculated_checksum = crc32(payload, crc) & 0xFFFFFFFF
                 
                 if calculated_checksum != stored_checksum:
                     self.logger.error(f"Checksum mismatch: 0x{calculated_checksum:08X} != 0x{stored_checksum:08X}")
@@ -243,17 +243,15 @@ class SJA1110FRER:
         for handle, stream_id in sorted(self.stream_identifications.items()):
             config.extend(stream_id.to_bytes())
         
-        # Pad to next section
-        while len(config) < self.SEQ_GEN_TABLE_OFFSET:
-            config.append(0)
+        # Pad to next section in one extend instead of a byte at a time
+        config.extend(bytes(max(0, self.SEQ_GEN_TABLE_OFFSET - len(config))))
         
         # Write sequence generation table
         for handle, seq_gen in sorted(self.sequence_generation.items()):
             config.extend(seq_gen.to_bytes())
         
-        # Pad to next section
-        while len(config) < self.SEQ_REC_TABLE_OFFSET:
-            config.append(0)
+        # Pad to next section in one extend instead of a byte at a time
+        config.extend(bytes(max(0, self.SEQ_REC_TABLE_OFFSET - len(config))))
         
         # Write sequence recovery table
         for handle, seq_rec in sorted(self.sequence_recovery.items()):
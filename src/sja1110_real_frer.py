@@ -11,6 +11,8 @@ from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from enum import IntEnum
 
+from sja1110_common import crc32
+
 # SJA1110 Hardware Configuration
 # Gold Box has 11 ports (0-10)
 # Port 0-3: 1000BASE-T1 PHYs
@@ -280,15 +282,14 @@ class SJA1110SwitchConfig:
             config.extend(entry)
         
         # Calculate and add CRC at the end
-        crc = self._calculate_crc32(bytes(config))
+        crc = self._calculate_crc32(config)
         config.extend(struct.pack('<I', crc))
         
         return bytes(config)
     
     def _calculate_crc32(self, data: bytes) -> int:
         """Calculate CRC32 for configuration"""
-        import zlib
-        return zlib.crc32(data) & 0xFFFFFFFF
+        return crc32(data) & 0xFFFFFFFF
     
     def save_switch_config(self, filename: str = "sja1110_switch.bin"):
         """Save switch configuration to binary file"""
@@ -11,34 +11,43 @@ from typing import List, Dict, Any
 from datetime import datetime
 from sja1110_dual_firmware import SJA1110FirmwareBuilder
 
+# Gold Box Port Mapping (확실한 포트 정보)
+PORT_INFO = {
+    # RJ45 Ports (External)
+    1: {'type': '100BASE-TX', 'connector': 'P1 (RJ45)', 'desc': '100Mbps Ethernet'},
+    2: {'type': '1000BASE-T', 'connector': 'P2A (RJ45)', 'desc': '1Gbps Ethernet A'},
+    3: {'type': '1000BASE-T', 'connector': 'P2B (RJ45)', 'desc': '1Gbps Ethernet B'},
+    4: {'type': '1000BASE-T', 'connector': 'P3 (RJ45)', 'desc': '1Gbps Ethernet'},
+
+    # 100BASE-T1 Automotive Ports
+    5: {'type': '100BASE-T1', 'connector': 'P6 (T1)', 'desc': 'Automotive T1'},
+    6: {'type': '100BASE-T1', 'connector': 'P7 (T1)', 'desc': 'Automotive T1'},
+    7: {'type': '100BASE-T1', 'connector': 'P8 (T1)', 'desc': 'Automotive T1'},
+    8: {'type': '100BASE-T1', 'connector': 'P9 (T1)', 'desc': 'Automotive T1'},
+    9: {'type': '100BASE-T1', 'connector': 'P10 (T1)', 'desc': 'Automotive T1'},
+    10: {'type': '100BASE-T1', 'connector': 'P11 (T1)', 'desc': 'Automotive T1'},
+
+    # Internal CPU Connection
+    0: {'type': 'CPU', 'connector': 'S32G PFE', 'desc': 'Host CPU Interface'}
+}
+
+# Connector labels by port number
+PORT_NAMES = {port: info['connector'] for port, info in PORT_INFO.items()}
+
 class GoldBoxRJ45Scenarios:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
-        
-        # Gold Box Port Mapping (확실한 포트 정보)
-        self.port_info = {
-            # RJ45 Ports (External)
-            1: {'type': '100BASE-TX', 'connector': 'P1 (RJ45)', 'desc': '100Mbps Ethernet'},
-            2: {'type': '1000BASE-T', 'connector': 'P2A (RJ45)', 'desc': '1Gbps Ethernet A'},
-            3: {'type': '1000BASE-T', 'connector': 'P2B (RJ45)', 'desc': '1Gbps Ethernet B'},
-            4: {'type': '1000BASE-T', 'connector': 'P3 (RJ45)', 'desc': '1Gbps Ethernet'},
-            
-            # 100BASE-T1 Automotive Ports
-            5: {'type': '100BASE-T1', 'connector': 'P6 (T1)', 'desc': 'Automotive T1'},
-            6: {'type': '100BASE-T1', 'connector': 'P7 (T1)', 'desc': 'Automotive T1'},
-            7: {'type': '100BASE-T1', 'connector': 'P8 (T1)', 'desc': 'Automotive T1'},
-            8: {'type': '100BASE-T1', 'connector': 'P9 (T1)', 'desc': 'Automotive T1'},
-            9: {'type': '100BASE-T1', 'connector': 'P10 (T1)', 'desc': 'Automotive T1'},
-            10: {'type': '100BASE-T1', 'connector': 'P11 (T1)', 'desc': 'Automotive T1'},
-            
-            # Internal CPU Connection
-            0: {'type': 'CPU', 'connector': 'S32G PFE', 'desc': 'Host CPU Interface'}
-        }
+        # The logger is module-wide; only the first instance attaches a handler
+        if not self.logger.handlers:
+            handler = logging.StreamHandler()
+            formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+        
+        # Per-instance copy of the port mapping, and its connector labels
+        self.port_info = {port: dict(info) for port, info in PORT_INFO.items()}
+        self.port_names = {port: info['connector'] for port, info in self.port_info.items()}
         
     def scenario_basic_rj45_replication(self) -> SJA1110FirmwareBuilder:
         """시나리오 1: 기본 RJ45 입력 복제"""
@@ -272,13 +281,12 @@ class GoldBoxRJ45Scenarios:
             
             # Show streams
             print(f"FRER Streams:")
-            for stream in builder.frer_streams:
-                src_info = self.port_info[stream['src_port']]
-                dst_info = [self.port_info[p] for p in stream['dst_ports']]
-                dst_names = [info['connector'] for info in dst_info]
-                print(f"  • {stream['name']}")
-                print(f"    {src_info['connector']} → {dst_names}")
-                print(f"    VLAN: {stream['vlan_id']}, Priority: {stream['priority']}")
+            port_names = self.port_names
+            for stream in builder.streams:
+                dst_names = [port_names[p] for p in stream.dst_ports]
+                print(f"  • {stream.name}")
+                print(f"    {port_names[stream.src_port]} → {dst_names}")
+                print(f"    VLAN: {stream.vlan_id}, Priority: {stream.priority}")
             
             # Save config
             builder.save_configuration_info(uc_file, switch_file)
@@ -299,19 +307,18 @@ class GoldBoxRJ45Scenarios:
         # 각 시나리오 분석
         for name, builder in scenarios.items():
             scenario_info = {
-                'stream_count': len(builder.frer_streams),
+                'stream_count': len(builder.streams),
                 'use_case': self.get_use_case_description(name),
                 'complexity': self.calculate_complexity(builder),
                 'port_mapping': []
             }
             
-            for stream in builder.frer_streams:
-                src_port = self.port_info[stream['src_port']]
-                dst_ports = [self.port_info[p] for p in stream['dst_ports']]
+            port_names = self.port_names
+            for stream in builder.streams:
                 scenario_info['port_mapping'].append({
-                    'src': src_port['connector'],
-                    'dst': [p['connector'] for p in dst_ports],
-                    'description': stream['name']
+                    'src': port_names[stream.src_port],
+                    'dst': [port_names[p] for p in stream.dst_ports],
+                    'description': stream.name
                 })
             
             comparison['scenarios'][name] = scenario_info
@@ -322,8 +329,8 @@ class GoldBoxRJ45Scenarios:
             used_in = []
             
             for name, builder in scenarios.items():
-                for stream in builder.frer_streams:
-                    if port_id == stream['src_port'] or port_id in stream['dst_ports']:
+                for stream in builder.streams:
+                    if port_id == stream.src_port or port_id in stream.dst_ports:
                         usage_count += 1
                         used_in.append(name)
                         break
@@ -363,8 +370,8 @@ class GoldBoxRJ45Scenarios:
         return descriptions.get(scenario_name, 'Custom scenario')
     
     def calculate_complexity(self, builder: SJA1110FirmwareBuilder) -> str:
-        stream_count = len(builder.frer_streams)
-        total_replications = sum(len(s['dst_ports']) for s in builder.frer_streams)
+        stream_count = len(builder.streams)
+        total_replications = sum(len(s.dst_ports) for s in builder.streams)
         
         if stream_count <= 2 and total_replications <= 6:
             return 'Low'
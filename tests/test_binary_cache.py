@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Generated-binary cache tests: a .key sidecar only keeps the file it was written with
+"""
+
+import os
+import sys
+import logging
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import goldbox_frer_config
+import sja1110_correct_firmware
+
+
+class BinaryCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cwd = os.getcwd()
+        os.chdir(tmp.name)
+        self.addCleanup(os.chdir, cwd)
+
+    def read(self, filename):
+        with open(filename, 'rb') as f:
+            return f.read()
+
+    def overwrite(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(b'written by another tool')
+
+
+class GoldBoxSaveConfigTest(BinaryCacheTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.config = goldbox_frer_config.GoldBoxFRERConfig()
+        self.config.create('pfe_external')
+        self.config.save_config('goldbox_frer.bin')
+        self.generated = self.read('goldbox_frer.bin')
+
+    def test_unchanged_binary_is_kept(self):
+        with mock.patch.object(self.config, 'generate_switch_binary') as generate:
+            self.config.save_config('goldbox_frer.bin')
+        generate.assert_not_called()
+        self.assertEqual(self.read('goldbox_frer.bin'), self.generated)
+
+    def test_overwritten_binary_is_regenerated(self):
+        self.overwrite('goldbox_frer.bin')
+        self.config.save_config('goldbox_frer.bin')
+        self.assertEqual(self.read('goldbox_frer.bin'), self.generated)
+
+    def test_removed_binary_is_regenerated(self):
+        os.remove('goldbox_frer.bin')
+        self.config.save_config('goldbox_frer.bin')
+        self.assertEqual(self.read('goldbox_frer.bin'), self.generated)
+
+
+class CorrectedFirmwareCacheTest(BinaryCacheTestCase):
+
+    def create(self):
+        with mock.patch('builtins.print'):
+            return sja1110_correct_firmware.create_corrected_firmware()
+
+    def test_overwritten_image_is_regenerated(self):
+        uc_file, switch_file = self.create()
+        generated = self.read(switch_file)
+
+        self.overwrite(switch_file)
+        builder = sja1110_correct_firmware.CorrectSJA1110Firmware
+        with mock.patch.object(builder, 'build_switch_config', autospec=True,
+                               side_effect=builder.build_switch_config) as build:
+            self.create()
+        build.assert_called_once()
+        self.assertEqual(self.read(switch_file), generated)
+
+
+if __name__ == '__main__':
+    unittest.main()
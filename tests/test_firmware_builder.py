@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+SJA1110FirmwareBuilder image layout tests
+"""
+
+import os
+import sys
+import json
+import struct
+import logging
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import sja1110_firmware_builder
+
+
+class FixedDatetime(datetime):
+    """datetime whose now() is pinned, so the header timestamp is known"""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 1, 1, 0, 0, 0)
+
+
+class FirmwareHeaderTest(unittest.TestCase):
+    """Layout of the SJA1110FirmwareBuilder image header"""
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.output = os.path.join(tmp.name, 'fw.bin')
+
+        self.builder = sja1110_firmware_builder.SJA1110FirmwareBuilder()
+        self.builder.add_general_config({'mac_address': '00:04:9F:11:22:33', 'frer_enable': True})
+        self.builder.add_port_config([{'id': i, 'speed': 1000, 'pvid': 1} for i in range(5)])
+        self.builder.add_vlan_config([{'id': 1, 'name': 'Default', 'ports': [0, 1, 2]}])
+        self.builder.add_ptp_config({})
+        with mock.patch.object(sja1110_firmware_builder, 'datetime', FixedDatetime):
+            self.builder.build_firmware(self.output)
+
+        with open(self.output, 'rb') as f:
+            self.image = f.read()
+
+    def test_header_struct_is_64_bytes(self):
+        self.assertEqual(sja1110_firmware_builder._HEADER.size, 64)
+        self.assertEqual(sja1110_firmware_builder.FirmwareHeader().header_size, 64)
+        self.assertEqual(len(sja1110_firmware_builder.FirmwareHeader().to_bytes()), 64)
+
+    def test_header_fields(self):
+        (magic, major, minor, patch, header_size, payload_size, checksum,
+         timestamp, config_offset, config_size) = struct.unpack_from('>IHHHHIIIII', self.image)
+
+        self.assertEqual(magic, 0x53A11110)
+        self.assertEqual((major, minor, patch), (1, 0, 0))
+        self.assertEqual(header_size, 64)
+        self.assertEqual(config_offset, 64)
+        self.assertEqual(payload_size, config_size)
+        self.assertEqual(len(self.image), 64 + payload_size)
+        self.assertEqual(timestamp, int(FixedDatetime.now().timestamp()))
+        # Reserved header bytes are zero
+        self.assertEqual(self.image[32:64], bytes(32))
+
+    def test_payload_starts_after_header(self):
+        section_id, length = struct.unpack_from('>II', self.image, 64)
+        self.assertEqual(section_id, min(self.builder.config_sections))
+        self.assertEqual(length, len(self.builder.config_sections[section_id]))
+
+    def test_metadata_matches_file(self):
+        with open(self.output.replace('.bin', '_meta.json')) as f:
+            metadata = json.load(f)
+        self.assertEqual(metadata['file_size'], len(self.image))
+
+    def test_validation(self):
+        self.assertTrue(self.builder.validate_firmware(self.output))
+
+        corrupted = bytearray(self.image)
+        corrupted[-1] ^= 0xFF
+        with open(self.output, 'wb') as f:
+            f.write(corrupted)
+        self.assertFalse(self.builder.validate_firmware(self.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+frer batch command tests, run against the ./frer script in a scratch directory
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import unittest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+FRER = os.path.join(ROOT, 'frer')
+
+
+class FrerBatchTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cwd = tmp.name
+
+    def frer(self, *args, stdin=None):
+        return subprocess.run([sys.executable, FRER, *args], cwd=self.cwd,
+                              input=stdin, capture_output=True, text=True)
+
+    def write_batch(self, commands):
+        with open(os.path.join(self.cwd, 'batch.json'), 'w') as f:
+            json.dump(commands, f)
+        return 'batch.json'
+
+    def read(self, filename, mode='r'):
+        with open(os.path.join(self.cwd, filename), mode) as f:
+            return f.read()
+
+    def test_streams_persist_across_commands(self):
+        result = self.frer('batch', '--file', self.write_batch([
+            'add-stream --stream-id 1 --src-port P1 --dst-ports P2A P2B --name first',
+            'add-stream --stream-id 2 --src-port P6 --dst-ports P7 P8 --vlan-id 200 --priority 5',
+            'save --file cfg.json',
+            'generate-binary --output sw.bin',
+        ]))
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+        streams = json.loads(self.read('cfg.json'))['frer_streams']
+        self.assertEqual(streams, [
+            {'stream_id': 1, 'name': 'first', 'src_port': 1, 'dst_ports': [2, 3],
+             'vlan_id': 100, 'priority': 7},
+            {'stream_id': 2, 'name': 'Stream_2', 'src_port': 5, 'dst_ports': [6, 7],
+             'vlan_id': 200, 'priority': 5},
+        ])
+
+        # The same streams loaded by a separate process give the same image
+        result = self.frer('batch', '--file', self.write_batch([
+            'load --file cfg.json',
+            'generate-binary --output reloaded.bin',
+        ]))
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertEqual(self.read('sw.bin', 'rb'), self.read('reloaded.bin', 'rb'))
+
+    def test_commands_from_stdin(self):
+        result = self.frer('batch', '--file', '-', stdin=json.dumps([
+            'add-stream --stream-id 7 --src-port P1 --dst-ports P2A',
+            'save --file cfg.json',
+        ]))
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+        self.assertIn('$ frer save --file cfg.json', result.stdout)
+
+        streams = json.loads(self.read('cfg.json'))['frer_streams']
+        self.assertEqual([s['stream_id'] for s in streams], [7])
+
+    def test_failing_command_stops_the_batch(self):
+        result = self.frer('batch', '--file', self.write_batch([
+            'add-stream --stream-id 1',
+            'save --file cfg.json',
+        ]))
+        self.assertEqual(result.returncode, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.cwd, 'cfg.json')))
+
+    def test_nested_batch_is_rejected(self):
+        result = self.frer('batch', '--file', self.write_batch([
+            'batch --file batch.json',
+        ]))
+        self.assertEqual(result.returncode, 1)
+        self.assertIn('nested batch', result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+SPI burst splitting tests, run against an in-memory SpiDev
+"""
+
+import os
+import sys
+import types
+import logging
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+import sja1110_common
+import sja1110_driver
+import sja1110_upload
+
+
+class FakeSpiDev:
+    """spidev.SpiDev stand-in: one message per call, memory keyed by byte address"""
+
+    def __init__(self):
+        self.messages = []
+        self.memory = {}
+
+    def open(self, bus, device):
+        pass
+
+    def close(self):
+        pass
+
+    def _header(self, tx):
+        return tx[0], int.from_bytes(bytes(tx[1:4]), 'big')
+
+    def writebytes2(self, tx):
+        tx = bytes(tx)
+        self.messages.append(tx)
+        _, address = self._header(tx)
+        for i, byte in enumerate(tx[4:]):
+            self.memory[address + i] = byte
+
+    def xfer2(self, tx):
+        tx = bytes(tx)
+        self.messages.append(tx)
+        cmd, address = self._header(tx)
+        if cmd & 0x80:
+            for i, byte in enumerate(tx[4:]):
+                self.memory[address + i] = byte
+            return [0] * len(tx)
+        return list(tx[:4]) + [self.memory.get(address + i, 0) for i in range(len(tx) - 4)]
+
+
+class SpiBurstTestCase(unittest.TestCase):
+    bufsiz = None
+
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+        # spidev's buffer size comes from a module parameter; point the
+        # lookup at a file the test controls (or at nothing for the default)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        bufsiz_path = os.path.join(tmp.name, 'bufsiz')
+        if self.bufsiz is not None:
+            with open(bufsiz_path, 'w') as f:
+                f.write(f'{self.bufsiz}\n')
+        patcher = mock.patch.object(sja1110_common, 'SPIDEV_BUFSIZ_PATH', bufsiz_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.spi = FakeSpiDev()
+        self.spidev = types.SimpleNamespace(SpiDev=lambda: self.spi)
+
+    def message_words(self):
+        """Data words carried by each message after its 4-byte header"""
+        return [(len(message) - 4) // 4 for message in self.spi.messages]
+
+
+class SpiSendTest(unittest.TestCase):
+
+    def test_falls_back_to_xfer2_without_writebytes2(self):
+        spi = types.SimpleNamespace(xfer2=mock.Mock())
+        sja1110_common.spi_send(spi, bytearray(b'\x80\x00\x10\x00\x01'))
+        spi.xfer2.assert_called_once_with([0x80, 0x00, 0x10, 0x00, 0x01])
+
+    def test_sends_buffer_with_writebytes2(self):
+        spi = FakeSpiDev()
+        sja1110_common.spi_send(spi, bytearray(b'\x80\x00\x10\x00\x01'))
+        self.assertEqual(spi.messages, [b'\x80\x00\x10\x00\x01'])
+
+
+class DriverBurstTest(SpiBurstTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with mock.patch.object(sja1110_driver, 'spidev', self.spidev):
+            self.driver = sja1110_driver.SJA1110Driver('spi')
+        self.spi.messages.clear()
+
+    def test_write_registers_splits_at_64_words(self):
+        values = list(range(150))
+        self.driver.write_registers(0x1000, values)
+
+        self.assertEqual(self.message_words(), [64, 64, 22])
+        starts = [int.from_bytes(m[1:4], 'big') for m in self.spi.messages]
+        self.assertEqual(starts, [0x1000, 0x1000 + 4 * 64, 0x1000 + 4 * 128])
+        self.assertTrue(all(m[0] == 0x80 for m in self.spi.messages))
+
+    def test_read_registers_splits_at_64_words(self):
+        self.driver.write_registers(0x2000, list(range(130)))
+        self.spi.messages.clear()
+
+        self.assertEqual(self.driver.read_registers(0x2000, 130), list(range(130)))
+        self.assertEqual(self.message_words(), [64, 64, 2])
+
+    def test_batched_writes_are_split(self):
+        with self.driver.batched():
+            for i in range(100):
+                self.driver.write_register(0x3000 + 4 * i, i)
+            self.assertEqual(self.spi.messages, [])
+
+        self.assertEqual(self.message_words(), [64, 36])
+        self.assertEqual(self.driver.read_registers(0x3000, 100), list(range(100)))
+
+    def test_reset_sends_queued_writes_before_settling(self):
+        sent_at_sleep = []
+        with mock.patch.object(sja1110_driver.time, 'sleep',
+                               lambda seconds: sent_at_sleep.append(len(self.spi.messages))):
+            with self.driver.batched():
+                self.driver.configure_vlan(100, [0, 1])
+                self.driver.reset(verify=False)
+
+        self.assertEqual(sent_at_sleep, [2])
+        reset = int(sja1110_driver.SJA1110Registers.RESET_CTRL)
+        self.assertEqual(int.from_bytes(self.spi.messages[-1][1:4], 'big'), reset)
+
+
+class SmallBufferDriverBurstTest(SpiBurstTestCase):
+    # 4-byte header + 20 words
+    bufsiz = 84
+
+    def test_bursts_fit_the_spidev_buffer(self):
+        with mock.patch.object(sja1110_driver, 'spidev', self.spidev):
+            driver = sja1110_driver.SJA1110Driver('spi')
+        self.spi.messages.clear()
+
+        driver.write_registers(0x1000, list(range(50)))
+        self.assertEqual(self.message_words(), [20, 20, 10])
+        self.assertTrue(all(len(m) <= self.bufsiz for m in self.spi.messages))
+
+
+class UploaderBurstTest(SpiBurstTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with mock.patch.object(sja1110_upload, 'HAS_SPI', True), \
+                mock.patch.object(sja1110_upload, 'spidev', self.spidev, create=True):
+            self.uploader = sja1110_upload.SJA1110Uploader('spi')
+
+    def test_upload_splits_at_64_words(self):
+        data = bytes(range(256)) * 5
+        with mock.patch.object(sja1110_upload, 'HAS_SPI', True), \
+                mock.patch('builtins.print'):
+            self.uploader._upload_via_spi(data, prefix=sja1110_upload.SJA1110Uploader.IMAGE_VALID_MARKER)
+
+        self.assertEqual(self.message_words(), [2, 64, 64, 64, 64, 64])
+        base = sja1110_upload.SJA1110Uploader.CONFIG_START_ADDR + 8
+        self.assertEqual(bytes(self.spi.memory[base + i] for i in range(len(data))), data)
+
+
+if __name__ == '__main__':
+    unittest.main()